@@ -0,0 +1,104 @@
+"""
+Async versions of the read-heavy pages, used in place of the ones in views.py
+when ASYNC_VIEWS is on (asgi.py turns it on). Under ASGI a sync view holds a
+worker thread for the whole request; these await the async ORM instead and
+only hop to a thread for the legacy overdue sweep.
+
+Apart from the dashboards, every row the template needs is loaded before
+rendering, joins included: a lazy query during rendering would run
+synchronously on the event loop, which Django refuses.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.db.models import Count, Q
+from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
+
+from .etags import versioned
+from .grids import CatalogueGrid
+from .models import BorrowTransaction, Penalty
+from .routing import read_only
+from .search import search_page
+from .services import sweep_overdue
+from .views import dashboard_stats
+
+
+async def _user(request):
+    # Resolve the user once and put it back on the request, so the auth
+    # context processor and the templates do not look it up synchronously
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+async def _sweep(user=None):
+    # check_and_create_penalties without a thread hop when the worker sweeps
+    if settings.PENALTY_SWEEP_MODE == 'request':
+        await sync_to_async(sweep_overdue)(user=user)
+
+
+async def _signed_in(user):
+    return user.is_authenticated
+
+
+# Django's login_required runs its (sync) test in a thread; an async test does not
+async_login_required = user_passes_test(_signed_in)
+
+
+# --------- Dashboards ---------
+# Their cached fragments (app/fragments.py) decide what the page has to read,
+# so these two render in a thread, where the template may query
+@async_login_required
+async def user_dashboard(request):
+    user = await _user(request)
+    await _sweep(user)
+    return await sync_to_async(render)(request, 'user/dashboard.html')
+
+
+@async_login_required
+async def admin_dashboard(request):
+    await _user(request)
+    await _sweep()
+    context = {'stats': SimpleLazyObject(dashboard_stats)}
+    return await sync_to_async(render)(request, 'admin/dashboard.html', context)
+
+
+# --------- Borrowing System (User side) ---------
+@async_login_required
+@versioned('items')
+async def browse_items(request):
+    await _user(request)
+    query = request.GET.get("q", "").strip()
+    # The FTS search is a raw query, which has no async iterator
+    page = await sync_to_async(search_page)(request) if query else await CatalogueGrid(request).apage()
+    return render(request, "user/browse_items.html", {"items": page.rows, "page": page, "query": query})
+
+
+@async_login_required
+@read_only
+@versioned('borrows:{user}', 'item-labels')
+async def my_borrows(request):
+    user = await _user(request)
+    await _sweep(user)
+    borrows = [borrow async for borrow in
+               BorrowTransaction.objects.filter(user=user).select_related('item').aiterator()]
+    return render(request, "user/my_borrows.html", {"borrows": borrows})
+
+
+# --------- Penalty System ---------
+@async_login_required
+@read_only
+async def user_penalties(request):
+    user = await _user(request)
+    await _sweep(user)
+    penalties = (Penalty.objects.filter(borrow_transaction__user=user)
+                 .select_related('borrow_transaction__item').order_by('-created_at'))
+    counts = await penalties.aaggregate(paid=Count('id', filter=Q(status="Paid")),
+                                        unpaid=Count('id', filter=Q(status="Unpaid")))
+    context = {
+        "penalties": [penalty async for penalty in penalties.aiterator()],
+        "paid_count": counts['paid'],
+        "unpaid_count": counts['unpaid'],
+    }
+    return render(request, "user/penalties.html", context)
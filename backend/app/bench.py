@@ -0,0 +1,76 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+# --------- Benchmark helpers ---------
+@contextmanager
+def scratch_database():
+    """
+    Point the default connection at a freshly migrated throwaway database for
+    the duration of a benchmark, so it never writes to the real data. SQLite
+    gets a file (not :memory:) so that worker threads share it.
+    """
+    workdir = None
+    if connection.vendor == 'sqlite':
+        workdir = tempfile.mkdtemp(prefix='borrowlink-bench-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection.settings_dict['NAME']
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if workdir:
+            os.rmdir(workdir)
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+# --------- View Benchmark ---------
+# url name -> how to request it: the role of the client, the method, and a
+# function of the id pools giving (url kwargs, query string or POST data).
+# Action views draw a fresh target from a pool on every call.
+VIEW_CASES = {
+    'home': ('anon', 'get', None),
+    'signup': ('anon', 'get', None),
+    'signin': ('anon', 'get', None),
+    'signout': ('user', 'get', None),
+    'contact': ('anon', 'get', None),
+    'about': ('anon', 'get', None),
+    'user_dashboard': ('user', 'get', None),
+    'admin_dashboard': ('admin', 'get', None),
+    'admin_users': ('admin', 'get', None),
+    'admin_items': ('admin', 'get', None),
+    'browse_items': ('user', 'get', lambda pools: ({}, {'q': 'laptop'})),
+    'item_suggestions': ('user', 'get', lambda pools: ({}, {'q': 'proj'})),
+    'borrow_request': ('user', 'get', lambda pools: ({'item_id': pools['item']}, {})),
+    'my_borrows': ('user', 'get', None),
+    'manage_borrows': ('admin', 'get', None),
+    'approve_borrow': ('admin', 'get', lambda pools: ({'borrow_id': pools['pending'].pop()}, {})),
+    'approve_borrows_batch': ('admin', 'post', lambda pools: (
+        {}, {'borrow_ids': [pools['pending'].pop() for _ in range(10)]})),
+    'return_item': ('admin', 'get', lambda pools: ({'borrow_id': pools['borrowed'].pop()}, {})),
+    'user_penalties': ('user', 'get', None),
+    'user_profile': ('user', 'get', None),
+    'admin_penalties': ('admin', 'get', None),
+    'admin_reports': ('admin', 'get', None),
+    'admin_export': ('admin', 'get', lambda pools: ({'dataset': 'borrows'}, {})),
+    'analytics_borrows': ('admin', 'get', None),
+    'analytics_penalties': ('admin', 'get', None),
+    'update_borrow_status': ('admin', 'post', lambda pools: (
+        {'borrow_id': pools['pending'].pop()}, {'status': 'Rejected'})),
+    'cancel_overdue': ('admin', 'get', lambda pools: ({'borrow_id': pools['overdue'].pop()}, {})),
+    'metrics': ('anon', 'get', None),
+}
+
+
+def url_names():
+    """Every named route in app/urls.py, in declaration order."""
+    from app import urls
+    return list(dict.fromkeys(pattern.name for pattern in urls.urlpatterns if pattern.name))
@@ -0,0 +1,39 @@
+import os
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class LRUFileCache(FileBasedCache):
+    """
+    Django's file cache, but full means evicting the least recently used
+    entries rather than random ones: a hit refreshes the file's mtime and
+    culling removes the oldest. For a fragment cache shared by the worker
+    processes of one machine.
+    """
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if value is self._missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(fname):
+            try:
+                return os.path.getmtime(fname)
+            except FileNotFoundError:
+                return 0
+
+        for fname in sorted(filelist, key=last_used)[:len(filelist) // self._cull_frequency]:
+            self._delete(fname)
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .models import Item, BorrowTransaction, Penalty, Counter
+
+
+# --------- Counters ---------
+# Running totals live in the Counter table. On SQLite they are maintained by
+# triggers (app/triggers.py), so every write path -- views, services, bulk
+# operations and cascading deletes -- updates them in its own transaction.
+class Counts:
+    def __init__(self, totals):
+        self._totals = totals
+
+    def count(self, *names):
+        return sum(self._totals.get(name, (0, 0))[0] for name in names)
+
+    def amount(self, *names):
+        return sum((Decimal(self._totals.get(name, (0, 0))[1]) for name in names), Decimal('0.00'))
+
+    def items(self):
+        return self._totals.items()
+
+
+def maintained():
+    return connection.vendor == 'sqlite'
+
+
+def read():
+    """All counters in one query (computed live where no triggers maintain them)."""
+    if not maintained():
+        return recount()
+    return Counts({name: (count, amount) for name, count, amount in
+                   Counter.objects.values_list('name', 'count', 'amount')})
+
+
+def recount(using='default'):
+    """Compute every counter from scratch with a handful of aggregate queries."""
+    users = User.objects.db_manager(using)
+    borrows = BorrowTransaction.objects.db_manager(using)
+    penalties = Penalty.objects.db_manager(using)
+    totals = {
+        'users': (users.filter(is_staff=False).count(), 0),
+        'accounts': (users.filter(is_superuser=False).count(), 0),
+        'items': (Item.objects.db_manager(using).count(), 0),
+        'borrows': (borrows.count(), 0),
+    }
+    for status, count in borrows.values_list('status').annotate(n=Count('id')).order_by():
+        totals[f'borrows:{status}'] = (count, 0)
+    overall = penalties.aggregate(n=Count('id'), total=Sum('amount'))
+    totals['penalties'] = (overall['n'], overall['total'] or 0)
+    for status, count, amount in penalties.values_list('status').annotate(
+            n=Count('id'), total=Sum('amount')).order_by():
+        totals[f'penalties:{status}'] = (count, amount or 0)
+    return Counts(totals)
+
+
+def drift():
+    """(name, stored, actual) for every counter whose stored value is wrong."""
+    stored, actual = read(), recount()
+    names = sorted({name for name, _ in stored.items()} | {name for name, _ in actual.items()})
+    return [
+        (name, (stored.count(name), stored.amount(name)), (actual.count(name), actual.amount(name)))
+        for name in names
+        if (stored.count(name), stored.amount(name)) != (actual.count(name), actual.amount(name))
+    ]
+
+
+def rebuild(using='default'):
+    with transaction.atomic(using=using):
+        # Delete first: on SQLite that takes the write lock before we count
+        Counter.objects.using(using).all().delete()
+        Counter.objects.using(using).bulk_create(
+            Counter(name=name, count=count, amount=amount) for name, (count, amount) in recount(using).items()
+        )
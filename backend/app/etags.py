@@ -0,0 +1,117 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from . import counters
+from .models import Version
+
+
+# --------- Page Versions ---------
+# A page declares the versions its content depends on (names in the Version
+# table, '{user}' standing for the signed-in user's id). Triggers bump them
+# on every write to those rows (app/triggers.py), so while they stay put the
+# page is the same: a client's ETag still matches and gets a 304, and anyone
+# else gets the body rendered last time, without a queryset or a template.
+def read_versions(names):
+    """Current value of each named version (0 if never bumped), in one query."""
+    # The database the page itself reads from: with a lagging replica the
+    # version must lag with it, or a stale body would be stored as current
+    using = router.db_for_read(Version)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT name, value FROM app_version WHERE name IN ({', '.join(['%s'] * len(names))})", names,
+        )
+        found = dict(cursor.fetchall())
+    return [found.get(name, 0) for name in names]
+
+
+def page_etag(request, view_name, sources, user_id):
+    names = [source.format(user=user_id) for source in sources]
+    per_user = any('{user}' in source for source in sources)
+    key = [
+        view_name,
+        str(user_id) if per_user else '*',
+        request.GET.urlencode(),
+        # Due dates turn into overdue ones at midnight without a write
+        timezone.localdate().isoformat(),
+        *map(str, read_versions(names)),
+    ]
+    return hashlib.sha1('|'.join(key).encode()).hexdigest()[:24]
+
+
+def _lookup(request, view_name, sources, user_id):
+    etag = page_etag(request, view_name, sources, user_id)
+    return etag, cache.get(f'page:{etag}')
+
+
+def _cached_response(request, etag, cached):
+    # A 304 if the client has this version, else the stored body, else None
+    response = get_conditional_response(request, etag=f'"{etag}"')
+    if response is None and cached is not None:
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+    return response
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def _finish(response, etag):
+    response['ETag'] = f'"{etag}"'
+    # Revalidate every time: that is one version query, and mostly a 304
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _applies(request):
+    # Without the triggers (not SQLite) versions never move, so never trust them
+    return request.method in ('GET', 'HEAD') and counters.maintained()
+
+
+def versioned(*sources):
+    """
+    Serve a GET view with an ETag built from the versions in ``sources``,
+    its query string and the date. Put it under the login decorators.
+    """
+    def decorator(view):
+        name = view.__name__
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if not _applies(request):
+                    return await view(request, *args, **kwargs)
+                user = await request.auser()
+                etag, cached = await sync_to_async(_lookup)(request, name, sources, user.pk)
+                response = _cached_response(request, etag, cached)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    if _cacheable(response):
+                        await cache.aset(f'page:{etag}', (response.content, response['Content-Type']),
+                                         settings.PAGE_CACHE_SECONDS)
+                return _finish(response, etag)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if not _applies(request):
+                    return view(request, *args, **kwargs)
+                etag, cached = _lookup(request, name, sources, request.user.pk)
+                response = _cached_response(request, etag, cached)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                    if _cacheable(response):
+                        cache.set(f'page:{etag}', (response.content, response['Content-Type']),
+                                  settings.PAGE_CACHE_SECONDS)
+                return _finish(response, etag)
+
+        return wrapper
+    return decorator
@@ -1,5 +1,8 @@
+from PIL import Image, UnidentifiedImageError
 from django import forms
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import UploadedFile
+from . import images
 from .models import Profile, Item, BorrowTransaction
 
 # --------- Sign Up Form ---------
@@ -52,4 +55,27 @@ class UserUpdateForm(forms.ModelForm):
 class ProfileUpdateForm(forms.ModelForm):
     class Meta:
         model = Profile
-        fields = ['department', 'id_number', 'contact_number', 'profile_image']
\ No newline at end of file
+        fields = ['department', 'id_number', 'contact_number', 'profile_image']
+
+    processed_image = None
+
+    def clean_profile_image(self):
+        image = self.cleaned_data.get('profile_image')
+        if isinstance(image, UploadedFile):
+            # Decoded once here; the same pixels feed the stored copy and the thumbnails
+            try:
+                image.seek(0)
+                self.processed_image = images.process_image(image)
+            except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+                raise forms.ValidationError("Upload a valid image.")
+        return image
+
+    def save(self, commit=True):
+        profile = super().save(commit=False)
+        if self.processed_image:
+            profile.profile_image = images.store_image(self.processed_image)
+        if commit:
+            profile.save()
+            if self.processed_image:
+                images.queue_thumbnails(self.processed_image)
+        return profile
\ No newline at end of file
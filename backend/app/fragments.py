@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+from .etags import read_versions
+
+CACHE_ALIAS = 'fragments'
+
+
+# --------- Fragment Cache ---------
+# A template fragment is cached under the versions it depends on (names in
+# the Version table, '{user}' standing for the signed-in user's id), which
+# the triggers in app/triggers.py move on every write to the rows behind
+# them. A changed version is a new key, so nothing is ever invalidated by
+# hand; stale entries age out of the LRU.
+def fragment_key(name, sources, user_id, seen=None):
+    """
+    ``seen`` maps version names to values already read while rendering this
+    page, so fragments sharing their versions cost one query between them.
+    """
+    names = tuple(source.format(user=user_id) for source in sources)
+    seen = {} if seen is None else seen
+    if names not in seen:
+        seen[names] = read_versions(list(names))
+    per_user = any('{user}' in source for source in sources)
+    return f"fragment:{name}:{user_id if per_user else '*'}:{':'.join(map(str, seen[names]))}"
+
+
+def cached_fragment(name, sources, user_id, render, seen=None):
+    """The HTML of fragment ``name``, from the cache or from ``render()``."""
+    cache = caches[CACHE_ALIAS]
+    key = fragment_key(name, sources, user_id, seen)
+    html = cache.get(key)
+    if html is not None:
+        metrics.inc('borrowlink_fragment_cache_total', fragment=name, result='hit')
+        return html
+    metrics.inc('borrowlink_fragment_cache_total', fragment=name, result='miss')
+    html = render()
+    cache.set(key, html, settings.FRAGMENT_CACHE_SECONDS)
+    return html
@@ -0,0 +1,220 @@
+import base64
+import binascii
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .models import Item, BorrowTransaction, Penalty
+
+
+class GridPage:
+    def __init__(self, rows, params, cursor, next_cursor, sort):
+        self.rows = rows
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.sort = sort
+        self._params = params
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def _query(self, cursor):
+        params = self._params.copy()
+        params.pop('cursor', None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor)
+
+    @property
+    def first_query(self):
+        return self._query(None)
+
+    @property
+    def all_query(self):
+        params = self._params.copy()
+        params.pop('cursor', None)
+        params['all'] = '1'
+        return params.urlencode()
+
+
+# --------- Keyset Grid ---------
+class Grid:
+    """
+    Server-side sorted, filtered and keyset-paginated table.
+
+    Subclasses declare the base ``queryset`` (or a ``get_queryset()``), the joins their template walks, the
+    sortable columns and the filters. Pages are fetched with a WHERE on the
+    last row's sort key (plus id as a tie-breaker) instead of an OFFSET, so
+    page 1000 costs the same as page 1.
+    """
+    queryset = None
+    select_related = ()
+    sorts = {'id': 'id'}      # ?sort=<key> or ?sort=-<key> -> non-null model field
+    default_sort = 'id'
+    filters = {}              # ?<param>=<value> -> ORM lookup
+    date_field = None         # lookup used by ?from= and ?to=
+    page_size = 50
+
+    def __init__(self, request, page_size=None):
+        self.params = request.GET
+        self.page_size = page_size or self.page_size
+
+    def get_queryset(self):
+        if self.queryset is None:
+            raise ImproperlyConfigured(f"{type(self).__name__} needs a queryset or a get_queryset().")
+        return self.queryset.all()
+
+    def filtered(self):
+        queryset = self.get_queryset().select_related(*self.select_related)
+        for param, lookup in self.filters.items():
+            value = self.params.get(param, '').strip()
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        if self.date_field:
+            for param, op in (('from', 'gte'), ('to', 'lte')):
+                day = parse_date(self.params.get(param, '') or '')
+                if day:
+                    queryset = queryset.filter(**{f'{self.date_field}__{op}': day})
+        return queryset
+
+    def _sort(self):
+        sort = self.params.get('sort', self.default_sort)
+        key = sort.lstrip('-')
+        if key not in self.sorts:
+            sort = self.default_sort
+            key = sort.lstrip('-')
+        return sort, self.sorts[key], sort.startswith('-')
+
+    @staticmethod
+    def _encode(value, pk):
+        # str() keeps full datetime precision, which the ORM parses back
+        raw = json.dumps([value, pk], default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def _decode(cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return value, int(pk)
+        except (binascii.Error, ValueError, TypeError):
+            return None
+
+    def _ordered(self):
+        sort, field, descending = self._sort()
+        prefix = '-' if descending else ''
+        return self.filtered().order_by(*dict.fromkeys((prefix + field, prefix + 'id'))), sort, field, descending
+
+    def _window(self):
+        # This page's rows plus one, which tells whether there is a next page
+        queryset, sort, field, descending = self._ordered()
+
+        cursor = self.params.get('cursor', '')
+        position = self._decode(cursor) if cursor else None
+        if position:
+            value, pk = position
+            op = 'lt' if descending else 'gt'
+            try:
+                if field == 'id':
+                    queryset = queryset.filter(**{f'id__{op}': pk})
+                else:
+                    queryset = queryset.filter(
+                        Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+                    )
+            except (ValidationError, ValueError, TypeError):
+                # A value the sort field cannot take (an edited cursor): start over
+                position = None
+
+        return queryset[:self.page_size + 1], sort, field, cursor if position else None
+
+    def _page(self, rows, sort, field, cursor):
+        next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            value = last
+            for part in field.split('__'):
+                value = getattr(value, part)
+            next_cursor = self._encode(value, last.pk)
+        return GridPage(rows, self.params, cursor, next_cursor, sort)
+
+    def page(self):
+        window, *key = self._window()
+        return self._page(list(window), *key)
+
+    async def apage(self):
+        window, *key = self._window()
+        return self._page([row async for row in window], *key)
+
+    def everything(self):
+        """
+        Every matching row in the requested order, unpaginated, and an empty
+        page describing the sort. The queryset is meant to be iterated, not
+        listed (see app/streaming.py).
+        """
+        queryset, sort, _, _ = self._ordered()
+        return queryset, GridPage([], self.params, None, None, sort)
+
+
+# --------- Admin Grids ---------
+class BorrowGrid(Grid):
+    select_related = ('user', 'item')
+    sorts = {'id': 'id', 'status': 'status', 'user': 'user__username', 'item': 'item__name'}
+    default_sort = '-id'
+    filters = {
+        'status': 'status',
+        'user': 'user__username__icontains',
+        'item': 'item__name__icontains',
+        'department': 'user__profile__department__iexact',
+    }
+    date_field = 'borrow_date'
+    queryset = BorrowTransaction.objects.all()
+
+
+class UserGrid(Grid):
+    select_related = ('profile',)
+    sorts = {'id': 'id', 'username': 'username', 'joined': 'date_joined'}
+    default_sort = 'username'
+    filters = {
+        'q': 'username__icontains',
+        'department': 'profile__department__iexact',
+    }
+    date_field = 'date_joined__date'
+    queryset = User.objects.filter(is_staff=False)
+
+
+class ItemGrid(Grid):
+    sorts = {'id': 'id', 'name': 'name', 'type': 'item_type', 'stock': 'stock'}
+    default_sort = 'name'
+    filters = {
+        'q': 'name__icontains',
+        'type': 'item_type',
+        'condition': 'condition',
+    }
+    queryset = Item.objects.all()
+
+
+class CatalogueGrid(ItemGrid):
+    page_size = 24
+    queryset = Item.objects.filter(stock__gt=0)
+
+
+class PenaltyGrid(Grid):
+    select_related = ('borrow_transaction__user', 'borrow_transaction__item')
+    sorts = {'id': 'id', 'created': 'created_at', 'amount': 'amount', 'status': 'status'}
+    default_sort = '-created'
+    filters = {
+        'status': 'status',
+        'user': 'borrow_transaction__user__username__icontains',
+        'item': 'borrow_transaction__item__name__icontains',
+        'department': 'borrow_transaction__user__profile__department__iexact',
+    }
+    date_field = 'created_at__date'
+    queryset = Penalty.objects.all()
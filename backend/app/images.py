@@ -0,0 +1,136 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = 'profile_images'
+THUMB_DIR = 'profile_images/thumbs'
+MAX_SIDE = 1024                          # originals are stored at most this large
+THUMB_SIZES = {'sm': 72, 'md': 300}      # square; 2x the navbar and profile slots
+THUMB_FORMATS = {'webp': ('WEBP', 80), 'jpg': ('JPEG', 85)}
+
+_pool = None
+_ready = set()
+
+
+@dataclass
+class ProcessedImage:
+    name: str        # content-hash path of the cleaned original
+    data: bytes
+    image: Image.Image
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_WORKERS', min(4, os.cpu_count() or 1)),
+            thread_name_prefix='thumbnails',
+        )
+    return _pool
+
+
+# --------- Upload Processing ---------
+def process_image(source):
+    """
+    Decode an image once, apply and drop its EXIF orientation, cap it at
+    MAX_SIDE and re-encode it without metadata. The stored name is derived
+    from the re-encoded bytes, so identical uploads share one file and a URL
+    never changes content.
+    """
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image, fmt, ext = image.convert('RGBA'), 'PNG', 'png'
+    else:
+        image, fmt, ext = image.convert('RGB'), 'JPEG', 'jpg'
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=90, optimize=True)   # no exif= argument, so no metadata
+    data = buffer.getvalue()
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    return ProcessedImage(f'{IMAGE_DIR}/{digest}.{ext}', data, image)
+
+
+def store_image(processed):
+    if not default_storage.exists(processed.name):
+        default_storage.save(processed.name, ContentFile(processed.data))
+    return processed.name
+
+
+# --------- Thumbnails ---------
+def _stem(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def thumbnail_name(name, size, ext):
+    return f'{THUMB_DIR}/{_stem(name)}-{size}.{ext}'
+
+
+def make_thumbnails(processed):
+    """
+    Write every size/format of ``processed`` that is not on disk yet. Pages
+    rendered meanwhile show the original (see thumbnail_url), so once any
+    thumbnail is written the versions of the users with this image move on
+    and their cached navbar fragment is rendered again.
+    """
+    written = 0
+    for size, side in THUMB_SIZES.items():
+        fitted = ImageOps.fit(processed.image, (side, side), Image.LANCZOS)
+        for ext, (fmt, quality) in THUMB_FORMATS.items():
+            name = thumbnail_name(processed.name, size, ext)
+            if default_storage.exists(name):
+                continue
+            image = fitted
+            if fmt == 'JPEG' and image.mode == 'RGBA':
+                image = Image.new('RGB', image.size, 'white')
+                image.paste(fitted, mask=fitted.getchannel('A'))
+            buffer = io.BytesIO()
+            image.save(buffer, fmt, quality=quality)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+            written += 1
+    if written:
+        # A no-op write, for the app_profile triggers to bump 'user:<id>'
+        Profile.objects.filter(profile_image=processed.name).update(profile_image=F('profile_image'))
+    return written
+
+
+def _make_thumbnails_logged(processed):
+    try:
+        return make_thumbnails(processed)
+    except Exception:
+        logger.exception("thumbnailing %s failed", processed.name)
+        raise
+
+
+def queue_thumbnails(processed):
+    """Generate thumbnails on the worker pool so the upload request returns at once."""
+    return _executor().submit(_make_thumbnails_logged, processed)
+
+
+def thumbnail_url(field, size, ext='jpg'):
+    """
+    URL of a thumbnail for an image field, or of the original while the
+    thumbnail has not been written yet (just uploaded, or not backfilled).
+    """
+    name = thumbnail_name(field.name, size, ext)
+    if name not in _ready:
+        if not default_storage.exists(name):
+            return field.url
+        _ready.add(name)   # content-addressed, so once present it never changes
+    return default_storage.url(name)
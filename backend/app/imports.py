@@ -0,0 +1,256 @@
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Item, Profile
+
+BATCH_ROWS = 1000
+MAX_REPORTED_ERRORS = 200
+
+ITEM_CONDITIONS = dict(Item.CONDITION_CHOICES)
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    rows: int = 0
+    errors: list = field(default_factory=list)   # (line, serial number, message)
+    error_count: int = 0
+    seconds: float = 0.0
+    hash_seconds: float = 0.0
+
+    @property
+    def per_second(self):
+        return self.created / self.seconds if self.seconds else 0.0
+
+    def error(self, line, key, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, key, message))
+
+
+def _unreadable(report, reader, exc):
+    # Nothing past this point can be read; the batches before it stand
+    message = "file is not UTF-8 text" if isinstance(exc, UnicodeDecodeError) else f"malformed CSV: {exc}"
+    report.error(reader.line_num + 1, '', message)
+
+
+def _columns(reader, report):
+    """The header row, or None (reported) when the file cannot be read at all."""
+    try:
+        return reader.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as exc:
+        _unreadable(report, reader, exc)
+        return None
+
+
+def _batches(reader, size, report):
+    batch = []
+    try:
+        for row in reader:
+            batch.append((reader.line_num, row))
+            if len(batch) == size:
+                yield batch
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as exc:
+        _unreadable(report, reader, exc)
+    if batch:
+        yield batch
+
+
+def open_csv(upload):
+    """Decode an uploaded file lazily; nothing is read into memory up front."""
+    return csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+
+
+# --------- Item Import ---------
+def _clean_item(values):
+    name = (values.get('name') or '').strip()
+    item_type = (values.get('item_type') or '').strip()
+    serial = (values.get('serial_number') or '').strip()
+    condition = (values.get('condition') or '').strip() or 'Available'
+    stock = (values.get('stock') or '').strip() or '0'
+
+    if not name or not item_type or not serial:
+        raise ValueError("name, item_type and serial_number are required")
+    if len(name) > 100 or len(item_type) > 50 or len(serial) > 50:
+        raise ValueError("value too long")
+    if condition not in ITEM_CONDITIONS:
+        raise ValueError(f"unknown condition '{condition}'")
+    if not stock.isdigit():
+        raise ValueError(f"stock must be a whole number, got '{stock}'")
+    return Item(name=name, item_type=item_type, serial_number=serial, condition=condition, stock=int(stock))
+
+
+def import_items(reader, upsert=False, batch_size=BATCH_ROWS):
+    """
+    Validate and load items from a CSV DictReader, BATCH_ROWS at a time.
+
+    Serial numbers are checked against the rest of the file as it streams and
+    against the database with one lookup per batch. New items are inserted with
+    bulk_create; with ``upsert`` existing serial numbers are updated in the same
+    statement, otherwise they are reported as errors. Each batch commits on its
+    own, so bad rows are skipped without losing the good ones. A file that
+    stops being readable (not UTF-8, broken CSV) ends the import there, with
+    a file error in the report.
+    """
+    report = ImportReport()
+    columns = _columns(reader, report)
+    if columns is None:
+        return report
+    missing = [column for column in ('name', 'item_type', 'serial_number') if column not in columns]
+    if missing:
+        report.error(1, '', f"missing column(s): {', '.join(missing)}")
+        return report
+
+    seen = set()
+    for batch in _batches(reader, batch_size, report):
+        candidates = {}
+        for line, values in batch:
+            report.rows += 1
+            try:
+                item = _clean_item(values)
+            except ValueError as exc:
+                report.error(line, (values.get('serial_number') or '').strip(), str(exc))
+                continue
+            if item.serial_number in seen:
+                report.error(line, item.serial_number, "duplicate serial number in file")
+                continue
+            seen.add(item.serial_number)
+            candidates[item.serial_number] = (line, item)
+
+        existing = set(Item.objects.filter(serial_number__in=list(candidates)).values_list('serial_number', flat=True))
+        if not upsert:
+            for serial in existing:
+                line, _ = candidates.pop(serial)
+                report.error(line, serial, "serial number already exists")
+
+        items = [item for _, item in candidates.values()]
+        with transaction.atomic():
+            if upsert:
+                Item.objects.bulk_create(
+                    items, update_conflicts=True, unique_fields=['serial_number'],
+                    update_fields=['name', 'item_type', 'condition', 'stock'],
+                )
+            else:
+                Item.objects.bulk_create(items)
+        updated = len(existing) if upsert else 0
+        report.updated += updated
+        report.created += len(items) - updated
+    report.errors.sort()
+    return report
+
+
+# --------- User Import ---------
+def _init_hasher(settings_module):
+    # Workers started with "spawn" (macOS, Windows) import nothing from the
+    # parent, so Django has to be configured before make_password can run
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def _hash(password):
+    # An empty password gets an unusable hash, which costs nothing to make
+    return make_password(password or None)
+
+
+def hasher_pool(workers=None):
+    """Process pool for password hashing, one worker per core by default."""
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_hasher, initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+    )
+
+
+def _clean_user(values):
+    username = (values.get('username') or '').strip()
+    email = (values.get('email') or '').strip()
+    if not username:
+        raise ValueError("username is required")
+    if len(username) > 150 or len(email) > 254:
+        raise ValueError("value too long")
+    try:
+        User.username_validator(username)
+    except ValidationError as exc:
+        raise ValueError(exc.messages[0])
+    profile = Profile(
+        department=(values.get('department') or '').strip()[:100],
+        id_number=(values.get('id_number') or '').strip()[:50],
+        contact_number=(values.get('contact_number') or '').strip()[:20],
+    )
+    return User(username=username, email=email, is_staff=False), profile, values.get('password') or ''
+
+
+def import_users(reader, workers=None, batch_size=BATCH_ROWS):
+    """
+    Create users and their profiles from a CSV DictReader.
+
+    Usernames are checked against the rest of the file and, once per batch,
+    against the database. Passwords are hashed in a process pool spread over
+    every core (PBKDF2 is CPU-bound, so threads would not help); each batch
+    is then inserted with two bulk_create calls in one transaction. Rows with
+    no password get an unusable one and can be set through a reset later.
+    """
+    report = ImportReport()
+    columns = _columns(reader, report)
+    if columns is None:
+        return report
+    if 'username' not in columns:
+        report.error(1, '', "missing column(s): username")
+        return report
+
+    workers = workers or os.cpu_count()
+    started = time.monotonic()
+    seen = set()
+    with hasher_pool(workers) as pool:
+        for batch in _batches(reader, batch_size, report):
+            candidates = {}
+            for line, values in batch:
+                report.rows += 1
+                try:
+                    user, profile, password = _clean_user(values)
+                except ValueError as exc:
+                    report.error(line, (values.get('username') or '').strip(), str(exc))
+                    continue
+                if user.username in seen:
+                    report.error(line, user.username, "duplicate username in file")
+                    continue
+                seen.add(user.username)
+                candidates[user.username] = (line, user, profile, password)
+
+            for username in User.objects.filter(username__in=list(candidates)).values_list('username', flat=True):
+                line = candidates.pop(username)[0]
+                report.error(line, username, "username already exists")
+            if not candidates:
+                continue
+
+            rows = list(candidates.values())
+            hashing = time.monotonic()
+            chunksize = max(1, len(rows) // (workers * 4))
+            hashes = pool.map(_hash, [password for _, _, _, password in rows], chunksize=chunksize)
+            for (_, user, _, _), hashed in zip(rows, hashes):
+                user.password = hashed
+            report.hash_seconds += time.monotonic() - hashing
+
+            with transaction.atomic():
+                users = User.objects.bulk_create([user for _, user, _, _ in rows])
+                profiles = []
+                for user, (_, _, profile, _) in zip(users, rows):
+                    profile.user = user
+                    profiles.append(profile)
+                Profile.objects.bulk_create(profiles)
+            report.created += len(rows)
+
+    report.seconds = time.monotonic() - started
+    report.errors.sort()
+    return report
@@ -0,0 +1,148 @@
+import logging
+import time
+import traceback
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('app.sql')
+
+# Stats of the request being handled. A ContextVar rather than a thread local:
+# under ASGI the view may run on a different thread than the middleware, and
+# asgiref carries the context across that hop.
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db', 'template', 'view', 'view_started')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0          # seconds, like the fields below
+        self.template = 0.0
+        self.view = None
+        self.view_started = None
+
+
+# --------- Query Timing ---------
+def _caller():
+    # Innermost frame in project code, skipping Django and this module
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base) and frame.filename != __file__ and 'site-packages' not in frame.filename:
+            return f"{frame.filename[len(base) + 1:]}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+def _record(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db += elapsed
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning("slow query %.1fms in %s at %s: %s", elapsed * 1000,
+                           stats.view or '-', _caller(), sql)
+
+
+def _install(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+# --------- Template Timing ---------
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing top-level renders for Server-Timing."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# --------- Middleware ---------
+class RequestTimingMiddleware:
+    """
+    Counts queries and their time per request, adds a Server-Timing header
+    (db, template, view, total) and logs queries slower than SLOW_QUERY_MS
+    with the view and the line of project code that ran them.
+
+    Off unless REQUEST_TIMING is set, in which case Django drops it from the
+    middleware chain at startup and the query wrapper is never installed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened from now on, plus any this thread already holds
+        connection_created.connect(_install, dispatch_uid='request_timing')
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(response, stats, started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current.get()
+        if stats is not None:
+            stats.view = f"{view_func.__module__}.{getattr(view_func, '__name__', type(view_func).__name__)}"
+            stats.view_started = time.perf_counter()
+
+    def _finish(self, response, stats, started):
+        finished = time.perf_counter()
+        timings = [
+            f'db;dur={stats.db * 1000:.1f};desc="{stats.queries} queries"',
+            f'template;dur={stats.template * 1000:.1f}',
+        ]
+        if stats.view_started is not None:
+            timings.append(f'view;dur={(finished - stats.view_started) * 1000:.1f}')
+        timings.append(f'total;dur={(finished - started) * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from app.images import make_thumbnails, process_image, store_image
+from app.models import Profile
+
+
+def _backfill(name):
+    with default_storage.open(name) as source:
+        processed = process_image(source)
+    store_image(processed)
+    return processed.name, make_thumbnails(processed)
+
+
+class Command(BaseCommand):
+    help = "Strip EXIF from existing profile images, move them to content-hash names and write their thumbnails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Images processed in parallel.")
+
+    def handle(self, *args, **options):
+        profiles = list(Profile.objects.exclude(profile_image='').exclude(profile_image__isnull=True)
+                        .only('id', 'profile_image'))
+        moved, replaced, thumbs, failed = [], set(), 0, 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [(profile, pool.submit(_backfill, profile.profile_image.name)) for profile in profiles]
+            for profile, future in futures:
+                try:
+                    name, written = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"  {profile.profile_image.name}: {exc}")
+                    continue
+                thumbs += written
+                if name != profile.profile_image.name:
+                    replaced.add(profile.profile_image.name)
+                    profile.profile_image = name
+                    moved.append(profile)
+
+        Profile.objects.bulk_update(moved, ['profile_image'], batch_size=500)
+
+        # The old originals still carry their EXIF (GPS included) and are
+        # served at their old URLs; remove those no profile points at now
+        still_used = set(Profile.objects.filter(profile_image__in=replaced).values_list('profile_image', flat=True))
+        removed = replaced - still_used
+        for name in removed:
+            default_storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(profiles)} profile images: {len(moved)} re-stored, {len(removed)} originals removed, "
+            f"{thumbs} thumbnails written, {failed} failed."
+        ))
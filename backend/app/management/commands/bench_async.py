@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.urls import reverse
+
+from app.bench import percentile, scratch_database
+from app.seed import seed
+
+# url name -> role of the client requesting it
+ROUTES = {
+    'browse_items': 'user',
+    'my_borrows': 'user',
+    'user_penalties': 'user',
+    'user_dashboard': 'user',
+    'admin_dashboard': 'admin',
+}
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read-heavy pages with N concurrent clients: sync views on the WSGI handler "
+        "(a thread per request) against the async views on the ASGI handler, on a seeded scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight at once.")
+        parser.add_argument('--seconds', type=float, default=10, help="Length of each timed run.")
+        parser.add_argument('--borrows', type=int, default=20000, help="Size of the seeded dataset.")
+        parser.add_argument('--users', type=int, default=50, help="Distinct signed-in students.")
+        parser.add_argument('--seed', type=int, default=42)
+        # Internal: one timed run in a fresh process, so each mode gets its own URLconf
+        parser.add_argument('--child', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.child(options)
+
+        with scratch_database() as name:
+            self.stderr.write(f"Seeding {options['borrows']} borrows...")
+            seed(users=max(options['users'], options['borrows'] // 20), items=max(50, options['borrows'] // 100),
+                 borrows=options['borrows'], seed=options['seed'])
+            plan = {'database': name, 'targets': self.targets(options['users'])}
+            connection.close()
+
+            self.stdout.write(f"{options['concurrency']} clients, {options['seconds']:.0f}s per run, "
+                              f"{options['borrows']} borrows")
+            for mode in options['modes']:
+                result = self.spawn(mode, plan, options)
+                self.stdout.write(
+                    f"  {mode}: {result['requests'] / result['seconds']:7.1f} req/s  "
+                    f"p50 {result['p50_ms']:7.1f}ms  p95 {result['p95_ms']:7.1f}ms  "
+                    f"errors {result['errors']}  peak threads {result['threads']}"
+                )
+
+    def targets(self, count):
+        # (path, session cookie) pairs; sessions are written straight to the store
+        def session(user):
+            store = SessionStore()
+            store[SESSION_KEY] = str(user.pk)
+            store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+            store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            store.create()
+            return f'{settings.SESSION_COOKIE_NAME}={store.session_key}'
+
+        students = [session(user) for user in User.objects.filter(is_staff=False).order_by('id')[:count]]
+        admin = session(User.objects.create(username='bench-admin', is_staff=True))
+        return [
+            (reverse(name), admin if role == 'admin' else cookie)
+            for name, role in ROUTES.items()
+            for cookie in (students if role == 'user' else [admin])
+        ]
+
+    def spawn(self, mode, plan, options):
+        env = dict(os.environ, ASYNC_VIEWS='1' if mode == 'asgi' else '0',
+                   # Measure the read path alone, without the inline sweep
+                   PENALTY_SWEEP_MODE='worker')
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_async',
+                   '--child', mode, '--concurrency', str(options['concurrency']),
+                   '--seconds', str(options['seconds']), '--seed', str(options['seed'])]
+        finished = subprocess.run(command, input=json.dumps(plan), env=env, capture_output=True, text=True,
+                                  check=True)
+        return json.loads(finished.stdout.splitlines()[-1])
+
+    # --------- Child Process ---------
+    def child(self, options):
+        plan = json.loads(sys.stdin.read())
+        settings.DATABASES['default']['NAME'] = plan['database']
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        rng = random.Random(options['seed'])
+        deadline = time.monotonic() + options['seconds']
+        latencies, errors = [], []
+        peak = [threading.active_count()]
+
+        def sample_threads():
+            while time.monotonic() < deadline:
+                peak[0] = max(peak[0], threading.active_count())
+                time.sleep(0.01)
+
+        sampler = threading.Thread(target=sample_threads, daemon=True)
+        sampler.start()
+        started = time.monotonic()
+        if options['child'] == 'wsgi':
+            self.run_wsgi(plan['targets'], host, rng, deadline, options['concurrency'], latencies, errors)
+        else:
+            asyncio.run(self.run_asgi(plan['targets'], host, rng, deadline, options['concurrency'],
+                                      latencies, errors))
+        elapsed = time.monotonic() - started
+
+        sys.stdout.write(json.dumps({
+            'mode': options['child'],
+            'requests': len(latencies),
+            'seconds': elapsed,
+            'errors': len(errors),
+            'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else 0,
+            'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else 0,
+            'threads': peak[0],
+        }) + '\n')
+
+    @staticmethod
+    def run_wsgi(targets, host, rng, deadline, concurrency, latencies, errors):
+        handler = WSGIHandler()
+        lock = threading.Lock()
+
+        def client():
+            while time.monotonic() < deadline:
+                with lock:
+                    path, cookie = rng.choice(targets)
+                environ = {
+                    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                    'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host, 'HTTP_COOKIE': cookie,
+                    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                }
+                status = []
+                began = time.perf_counter()
+                response = handler(environ, lambda line, headers, exc_info=None: status.append(line))
+                b''.join(response)
+                response.close()
+                elapsed = time.perf_counter() - began
+                with lock:
+                    latencies.append(elapsed)
+                    if not status[0].startswith('200'):
+                        errors.append(status[0])
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    @staticmethod
+    async def run_asgi(targets, host, rng, deadline, concurrency, latencies, errors):
+        application = ASGIHandler()
+
+        async def call(path, cookie):
+            done = asyncio.Event()
+            status = []
+            messages = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+
+            async def receive():
+                message = next(messages, None)
+                if message is None:
+                    # Stay connected until the response is sent
+                    await done.wait()
+                    return {'type': 'http.disconnect'}
+                return message
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    done.set()
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+                'client': ('127.0.0.1', 0), 'server': (host, 80),
+            }
+            await application(scope, receive, send)
+            return status[0]
+
+        async def client():
+            while time.monotonic() < deadline:
+                path, cookie = rng.choice(targets)
+                began = time.perf_counter()
+                status = await call(path, cookie)
+                latencies.append(time.perf_counter() - began)
+                if status != 200:
+                    errors.append(status)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
@@ -0,0 +1,107 @@
+import queue
+import random
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from app.bench import scratch_database
+from app.models import Item, BorrowTransaction
+from app.services import reserve_stock
+
+
+def naive_approve(borrow):
+    # The old approve_borrow: read, check and write stock in Python
+    if borrow.item.stock >= borrow.quantity:
+        borrow.item.stock -= borrow.quantity
+        borrow.item.save()
+        borrow.status = 'Borrowed'
+        borrow.save()
+        return 'ok'
+    return 'stock'
+
+
+def guarded_approve(borrow):
+    result = reserve_stock(borrow)
+    return 'ok' if result.ok else result.reason
+
+
+class Command(BaseCommand):
+    help = "Hammer stock reservation from several threads and check that stock stays consistent."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--borrows', type=int, default=2000, help="Pending requests competing for the item.")
+        parser.add_argument('--stock', type=int, default=500, help="Initial stock of the contended item.")
+        parser.add_argument('--repeat', type=int, default=2, help="How many times each request is approved (double clicks).")
+        parser.add_argument('--naive', action='store_true', help="Benchmark the old read-check-write approval instead.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options)
+
+    def run(self, options):
+        user = User.objects.create(username='bench')
+        item = Item.objects.create(name='Contended', item_type='Bench', serial_number='BENCH-1',
+                                   stock=options['stock'])
+        BorrowTransaction.objects.bulk_create(
+            BorrowTransaction(user=user, item=item, quantity=1) for _ in range(options['borrows'])
+        )
+        ids = list(BorrowTransaction.objects.values_list('id', flat=True)) * options['repeat']
+        random.Random(options['seed']).shuffle(ids)
+
+        work = queue.Queue()
+        for borrow_id in ids:
+            work.put(borrow_id)
+        approve = naive_approve if options['naive'] else guarded_approve
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker():
+            local = Counter()
+            try:
+                while True:
+                    try:
+                        borrow_id = work.get_nowait()
+                    except queue.Empty:
+                        break
+                    borrow = BorrowTransaction.objects.select_related('item').get(id=borrow_id)
+                    try:
+                        local[approve(borrow)] += 1
+                    except OperationalError:
+                        local['error'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        item.refresh_from_db()
+        borrowed = BorrowTransaction.objects.filter(status='Borrowed').count()
+        expected = min(options['stock'], options['borrows'])
+        consistent = item.stock == options['stock'] - borrowed and borrowed == expected
+
+        self.stdout.write(
+            f"{'naive' if options['naive'] else 'guarded'}: {len(ids)} approvals on {options['threads']} threads "
+            f"in {elapsed:.2f}s ({len(ids) / elapsed:.0f}/s)"
+        )
+        self.stdout.write(
+            f"  ok={outcomes['ok']} no-stock={outcomes['stock']} stale-status={outcomes['status']} "
+            f"errors={outcomes['error']}"
+        )
+        self.stdout.write(f"  borrowed={borrowed} (expected {expected}), final stock={item.stock}")
+        if consistent:
+            self.stdout.write(self.style.SUCCESS("  stock is consistent"))
+        else:
+            self.stdout.write(self.style.ERROR("  stock is INCONSISTENT"))
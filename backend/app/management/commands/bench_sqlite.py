@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Count
+
+from app.bench import percentile, scratch_database
+from app.models import Item, BorrowTransaction
+from app.seed import seed
+from app.services import approve_pending, return_borrow, sweep_overdue
+
+PROFILES = ('default', 'production')
+SQLITE_KEYS = ('OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')
+
+
+def read_page(rng, user_ids):
+    # What the history and report pages do: a user's loans, and status totals
+    list(BorrowTransaction.objects.filter(user_id=rng.choice(user_ids)).select_related('item')[:50])
+    list(BorrowTransaction.objects.values('status').annotate(n=Count('id')))
+
+
+def write_page(rng, user_ids, item_ids):
+    # Request, approve and return a loan: three write transactions, the
+    # approval reading before it writes like the overdue sweep does
+    borrow = BorrowTransaction.objects.create(user_id=rng.choice(user_ids), item_id=rng.choice(item_ids))
+    if approve_pending(borrow_ids=[borrow.id]).results.get(borrow.id) == 'approved':
+        borrow.refresh_from_db()
+        return_borrow(borrow)
+
+
+class Command(BaseCommand):
+    help = "Mixed read/write throughput of the SQLite connection profiles (see SQLITE_PRODUCTION in settings)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--readers', type=int, default=6)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--borrows', type=int, default=20000, help="Size of the seeded dataset.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("bench_sqlite compares SQLite profiles; the default database is not SQLite.")
+        saved = {key: connection.settings_dict.get(key) for key in SQLITE_KEYS}
+        try:
+            for profile in options['profiles']:
+                self.apply(profile)
+                with scratch_database():
+                    self.run(profile, options)
+        finally:
+            connection.settings_dict.update(saved)
+
+    def apply(self, profile):
+        # Threads share this settings dict, so their connections pick it up
+        connection.close()
+        if profile == 'production':
+            connection.settings_dict.update(settings.SQLITE_PRODUCTION,
+                                            OPTIONS=dict(settings.SQLITE_PRODUCTION['OPTIONS']))
+        else:
+            connection.settings_dict.update(OPTIONS={}, CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+
+    def run(self, profile, options):
+        seed(users=max(50, options['borrows'] // 20), items=max(20, options['borrows'] // 100),
+             borrows=options['borrows'], seed=options['seed'])
+        # Every thread has to see the seeded rows, and a stale sweep would
+        # otherwise run inside the timed window
+        sweep_overdue()
+        user_ids = list(User.objects.filter(is_staff=False).values_list('id', flat=True))
+        item_ids = list(Item.objects.filter(stock__gt=0).values_list('id', flat=True))
+        connection.close()
+
+        deadline = time.monotonic() + options['seconds']
+        latencies = defaultdict(list)
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker(kind, number):
+            rng = random.Random(f"{options['seed']}-{kind}-{number}")
+            local_latency, local = [], Counter()
+            try:
+                while time.monotonic() < deadline:
+                    # One request: Django closes or keeps the connection at both ends
+                    close_old_connections()
+                    started = time.perf_counter()
+                    try:
+                        if kind == 'read':
+                            read_page(rng, user_ids)
+                        else:
+                            write_page(rng, user_ids, item_ids)
+                        local[kind] += 1
+                        local_latency.append(time.perf_counter() - started)
+                    except OperationalError:
+                        local[f'{kind} errors'] += 1
+                    close_old_connections()
+            finally:
+                connection.close()
+                with lock:
+                    latencies[kind].extend(local_latency)
+                    outcomes.update(local)
+
+        threads = [threading.Thread(target=worker, args=('read', n)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=('write', n)) for n in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{profile}: {options['readers']} readers, {options['writers']} writers, {elapsed:.1f}s")
+        for kind in ('read', 'write'):
+            samples = latencies[kind]
+            p50 = percentile(samples, 0.5) * 1000 if samples else 0
+            p95 = percentile(samples, 0.95) * 1000 if samples else 0
+            self.stdout.write(
+                f"  {kind:5} {outcomes[kind] / elapsed:8.1f}/s  p50 {p50:6.1f}ms  p95 {p95:6.1f}ms  "
+                f"locked {outcomes[f'{kind} errors']}"
+            )
+
@@ -0,0 +1,123 @@
+import json
+import platform
+import sys
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from app.bench import VIEW_CASES, percentile, scratch_database, url_names
+from app.models import BorrowTransaction, Item
+from app.seed import seed
+
+
+class Command(BaseCommand):
+    help = "Measure p50/p95 latency and query counts of every view in app/urls.py at several data sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help="Comma-separated borrow counts; users and items scale with them.")
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per view.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per view first.")
+        parser.add_argument('--views', default='', help="Comma-separated url names (default: all).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default='', help="Write the JSON report here instead of stdout.")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        wanted = [name for name in options['views'].split(',') if name] or url_names()
+        report = {
+            'meta': {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'sizes': sizes,
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'results': [],
+            'skipped': [name for name in wanted if name not in VIEW_CASES],
+        }
+
+        setup_test_environment()
+        try:
+            for size in sizes:
+                with scratch_database():
+                    self.stderr.write(f"Seeding {size} borrows...")
+                    seed(users=max(10, size // 10), items=max(50, size // 20), borrows=size, seed=options['seed'])
+                    for name in wanted:
+                        if name in VIEW_CASES:
+                            result = self.measure(name, options)
+                            result['size'] = size
+                            report['results'].append(result)
+                            self.stderr.write(
+                                f"  {name:24} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+                                f"{result['queries']:4} queries  [{result['status']}]"
+                            )
+        finally:
+            teardown_test_environment()
+
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(data + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            sys.stdout.write(data + '\n')
+
+    def pools(self, needed):
+        def ids(status):
+            return list(BorrowTransaction.objects.filter(status=status).order_by('-id')
+                        .values_list('id', flat=True)[:needed])
+        return {
+            'pending': ids('Pending'),
+            'borrowed': ids('Borrowed'),
+            'overdue': ids('Overdue'),
+            'item': Item.objects.filter(stock__gt=0).values_list('id', flat=True).first(),
+        }
+
+    def measure(self, name, options):
+        role, method, arguments = VIEW_CASES[name]
+        runs = options['warmup'] + options['iterations']
+        pools = self.pools(runs * 10)
+        client = Client()
+        # The busiest borrower, so per-user pages show their worst case
+        user = User.objects.filter(is_staff=False).annotate(n=Count('borrowtransaction')).order_by('-n').first()
+        admin = User.objects.filter(username='bench-admin').first() or \
+            User.objects.create_user('bench-admin', password='bench', is_staff=True)
+
+        timings, queries, statuses = [], [], set()
+        for run in range(runs):
+            if role != 'anon':
+                client.force_login(admin if role == 'admin' else user)
+            kwargs, data = arguments(pools) if arguments else ({}, {})
+            url = reverse(name, kwargs=kwargs)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                for _ in getattr(response, 'streaming_content', ()):
+                    pass
+                elapsed = time.perf_counter() - started
+            if run >= options['warmup']:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured.captured_queries))
+                statuses.add(response.status_code)
+
+        return {
+            'view': name,
+            'role': role,
+            'method': method.upper(),
+            'status': ','.join(str(status) for status in sorted(statuses)),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'queries': percentile(queries, 0.50),
+            'queries_max': max(queries),
+        }
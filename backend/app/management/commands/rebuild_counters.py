@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import counters
+
+
+class Command(BaseCommand):
+    help = "Check the dashboard/report counters against the real tables and rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drift; exit with an error if any is found.")
+
+    def handle(self, *args, **options):
+        drifted = counters.drift()
+        for name, stored, actual in drifted:
+            self.stdout.write(f"  {name}: stored {stored[0]} / {stored[1]}, actual {actual[0]} / {actual[1]}")
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f"{len(drifted)} counter(s) drifted.")
+            self.stdout.write(self.style.SUCCESS("Counters match the tables."))
+            return
+
+        counters.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters ({len(drifted)} had drifted)."))
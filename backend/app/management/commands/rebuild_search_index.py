@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Item
+from app.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text catalogue index from the items table."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write("Full-text index is only used on SQLite; nothing to do.")
+            return
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {Item.objects.count()} items."))
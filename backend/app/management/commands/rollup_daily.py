@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.models import SweepState
+from app.rollups import ROLLUP_JOB, roll_up
+
+
+class Command(BaseCommand):
+    help = "Roll up borrowing and penalty activity for every closed day not rolled up yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Discard existing rollups and start over.")
+
+    def handle(self, *args, **options):
+        days = roll_up(rebuild=options['rebuild'])
+        watermark = SweepState.objects.get(name=ROLLUP_JOB).last_swept_at
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {days} day(s); complete through {watermark:%Y-%m-%d}."
+                                             if watermark else f"Rolled up {days} day(s); no activity yet."))
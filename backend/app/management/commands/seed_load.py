@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import BorrowTransaction
+from app.seed import BATCH_ROWS, SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic dataset (users, profiles, items, borrows, penalties) for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--items', type=int, default=2000)
+        parser.add_argument('--borrows', type=int, default=200000)
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed gives the same data.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_ROWS)
+        parser.add_argument('--append', action='store_true',
+                            help="Add to a database that already has borrows instead of refusing.")
+
+    def handle(self, *args, **options):
+        if not options['append'] and BorrowTransaction.objects.exists():
+            raise CommandError("The database already has borrows; pass --append to add load data anyway.")
+
+        started = time.monotonic()
+        result = seed(options['users'], options['items'], options['borrows'],
+                      seed=options['seed'], batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        rows = result.users * 2 + result.items + result.borrows + result.penalties
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {result.users} users (+ profiles), {result.items} items, {result.borrows} borrows and "
+            f"{result.penalties} penalties in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s). "
+            f"Seeded users log in with password '{SEED_PASSWORD}'."
+        ))
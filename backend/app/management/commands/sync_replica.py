@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.routing import REPLICA
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto the replica file (online backup; readers are not blocked)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep syncing every N seconds (default: sync once).")
+        parser.add_argument('--pages', type=int, default=1024,
+                            help="Pages copied per step, so the primary is never locked for long.")
+
+    def handle(self, *args, **options):
+        if REPLICA not in settings.DATABASES:
+            raise CommandError("No replica configured; set DATABASE_REPLICA to the replica file path.")
+        primary = connections['default']
+        if primary.vendor != 'sqlite' or connections[REPLICA].vendor != 'sqlite':
+            raise CommandError("sync_replica copies SQLite files; use the database's own replication otherwise.")
+
+        while True:
+            started = time.monotonic()
+            primary.ensure_connection()
+            # Writes to a temporary connection, not Django's, so open replica
+            # readers just see the new pages on their next transaction
+            target = sqlite3.connect(settings.DATABASES[REPLICA]['NAME'])
+            try:
+                primary.connection.backup(target, pages=options['pages'])
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f"Replica synced in {time.monotonic() - started:.3f}s."))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import NoReverseMatch, resolve, reverse
+
+from app.pagecache import CACHE_ALIAS
+
+# url names of the views under @public_page
+PAGES = ('home', 'about', 'contact', 'signin', 'signup')
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the public pages into the page cache (PUBLIC_PAGE_CACHE), compressed, so the first "
+        "anonymous visitors after a deploy do not render them. Run it after collectstatic: the pages "
+        "link the fingerprinted stylesheets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*', default=list(PAGES), help="url names (default: all public pages).")
+
+    def handle(self, *args, **options):
+        if settings.CACHES[CACHE_ALIAS]['BACKEND'].endswith('LocMemCache'):
+            self.stderr.write("PUBLIC_PAGE_CACHE is per process: the running workers will not see these pages.")
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        factory = RequestFactory(HTTP_HOST=host)
+
+        for name in options['pages']:
+            try:
+                path = reverse(name)
+            except NoReverseMatch:
+                raise CommandError(f"No url named {name!r}.")
+            match = resolve(path)
+            if not hasattr(match.func, 'fill'):
+                raise CommandError(f"{name} is not a @public_page view.")
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            entry, response = match.func.fill(request, *match.args, **match.kwargs)
+            if entry is None:
+                raise CommandError(f"{path} answered {response.status_code}; nothing was cached.")
+            sizes = '  '.join(f"{coding} {len(body)}" for coding, body in entry['bodies'].items())
+            self.stdout.write(f"{name}: {sizes}{'  (per-visitor CSRF token)' if entry['personal'] else ''}")
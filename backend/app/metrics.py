@@ -0,0 +1,195 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import transaction
+
+from . import counters
+
+# Histogram buckets for request latency, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_SECONDS = 1.0
+
+# name -> (type, help); every sample below belongs to one of these families
+FAMILIES = {
+    'borrowlink_http_requests_total': ('counter', "Requests handled, by route, method and status."),
+    'borrowlink_http_errors_total': ('counter', "Requests that raised or returned a 5xx, by route."),
+    'borrowlink_http_request_duration_seconds': ('histogram', "Request latency by route."),
+    'borrowlink_approvals_total': ('counter', "Borrow requests approved."),
+    'borrowlink_returns_total': ('counter', "Loans returned."),
+    'borrowlink_penalties_created_total': ('counter', "Penalties issued, by the sweep or by hand."),
+    'borrowlink_sweep_failures_total': ('counter', "Sweep worker runs that raised; the worker carries on."),
+    'borrowlink_fragment_cache_total': ('counter', "Dashboard fragment cache lookups, by fragment and result."),
+    'borrowlink_page_cache_total': ('counter', "Anonymous public page cache lookups, by page and result."),
+    'borrowlink_loans': ('gauge', "Borrow transactions by state (active = Borrowed + Approved)."),
+    'borrowlink_unpaid_penalties': ('gauge', "Unpaid penalties."),
+    'borrowlink_unpaid_penalties_amount': ('gauge', "Total of unpaid penalties."),
+}
+
+# Samples keyed by their exposition line ('name{labels}'), so merging the
+# files of several processes is a plain sum per key
+_samples = defaultdict(float)
+_lock = threading.Lock()
+_flushed_at = 0.0
+_token = f"{os.getpid()}-{time.time_ns()}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def inc(name, amount=1, **labels):
+    with _lock:
+        _samples[name + _labels(**labels)] += amount
+
+
+def inc_on_commit(name, amount=1, **labels):
+    """Count a business event once its transaction commits (at once outside one)."""
+    if amount:
+        transaction.on_commit(lambda: inc(name, amount, **labels))
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        # Every bucket is touched so they stay in ascending order for render()
+        for bound in BUCKETS:
+            _samples[name + '_bucket' + _labels(**labels, le=bound)] += seconds <= bound
+        _samples[name + '_bucket' + _labels(**labels, le='+Inf')] += 1
+        _samples[name + '_sum' + _labels(**labels)] += seconds
+        _samples[name + '_count' + _labels(**labels)] += 1
+
+
+# --------- Shared File ---------
+def flush(force=False):
+    """
+    Write this process's samples to METRICS_DIR, at most every FLUSH_SECONDS.
+
+    Each process owns one file named after its pid and start time, replaced
+    atomically, and a scrape sums every file in the directory. Files of
+    processes that have exited are kept so counters never go backwards;
+    clear the directory when deploying.
+    """
+    global _flushed_at
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (not force and now - _flushed_at < FLUSH_SECONDS):
+        return
+    _flushed_at = now
+    with _lock:
+        data = json.dumps(_samples)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{_token}.json')
+    with open(path + '.tmp', 'w') as handle:
+        handle.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def collect():
+    """Samples of every process (or just this one without METRICS_DIR)."""
+    if not settings.METRICS_DIR:
+        with _lock:
+            return dict(_samples)
+    flush(force=True)
+    merged = defaultdict(float)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as handle:
+                samples = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        for key, value in samples.items():
+            merged[key] += value
+    return merged
+
+
+def _gauges():
+    # The trigger-maintained Counter table: one small query, no table scans
+    counts = counters.read()
+    return {
+        'borrowlink_loans' + _labels(state='pending'): counts.count('borrows:Pending'),
+        'borrowlink_loans' + _labels(state='active'): counts.count('borrows:Borrowed', 'borrows:Approved'),
+        'borrowlink_loans' + _labels(state='overdue'): counts.count('borrows:Overdue'),
+        'borrowlink_unpaid_penalties': counts.count('penalties:Unpaid'),
+        'borrowlink_unpaid_penalties_amount': float(counts.amount('penalties:Unpaid')),
+    }
+
+
+def _family(key):
+    name = key.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def render():
+    """The Prometheus text exposition format (version 0.0.4)."""
+    samples = collect()
+    samples.update(_gauges())
+    by_family = defaultdict(list)
+    for key, value in samples.items():
+        by_family[_family(key)].append((key, value))
+
+    lines = []
+    for name, (kind, help_text) in FAMILIES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key, value in by_family.get(name, ()):
+            value = float(value)
+            lines.append(f'{key} {int(value) if value.is_integer() else value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+# --------- Middleware ---------
+class MetricsMiddleware:
+    """Request count, error count and latency histogram per route name."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self._record(request, 500, started)
+            raise
+        self._record(request, response.status_code, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            self._record(request, 500, started)
+            raise
+        self._record(request, response.status_code, started)
+        return response
+
+    @staticmethod
+    def _record(request, status, started):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        inc('borrowlink_http_requests_total', view=view, method=request.method, status=status)
+        if status >= 500:
+            inc('borrowlink_http_errors_total', view=view)
+        observe('borrowlink_http_request_duration_seconds', time.perf_counter() - started, view=view)
+        flush()
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_alter_borrowtransaction_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SweepState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('owner', models.CharField(blank=True, max_length=100)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+                ('last_swept_at', models.DateTimeField(blank=True, null=True)),
+                ('last_duration_ms', models.FloatField(default=0)),
+                ('last_overdue', models.PositiveIntegerField(default=0)),
+                ('last_penalties', models.PositiveIntegerField(default=0)),
+                ('runs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
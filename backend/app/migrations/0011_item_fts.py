@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# External-content FTS5 index over Item. The triggers that keep it in sync
+# are app.triggers.FTS_TRIGGERS: the post_migrate hook creates them, and
+# fills the index, on this migrate and after any later table rebuild.
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE app_item_fts USING fts5(
+        name, item_type, serial_number,
+        content='app_item', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS app_item_fts_ai",
+    "DROP TRIGGER IF EXISTS app_item_fts_ad",
+    "DROP TRIGGER IF EXISTS app_item_fts_au",
+    "DROP TABLE IF EXISTS app_item_fts",
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_sweepstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
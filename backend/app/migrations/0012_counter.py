@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:13
+
+from django.db import migrations, models
+
+# The triggers keeping app_counter current are created by the post_migrate
+# hook (app/triggers.py); unapplying this migration has to drop them before
+# the table, or every write to the counted tables fails.
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS app_counter_user_ai",
+    "DROP TRIGGER IF EXISTS app_counter_user_ad",
+    "DROP TRIGGER IF EXISTS app_counter_user_au",
+    "DROP TRIGGER IF EXISTS app_counter_item_ai",
+    "DROP TRIGGER IF EXISTS app_counter_item_ad",
+    "DROP TRIGGER IF EXISTS app_counter_borrow_ai",
+    "DROP TRIGGER IF EXISTS app_counter_borrow_ad",
+    "DROP TRIGGER IF EXISTS app_counter_borrow_au",
+    "DROP TRIGGER IF EXISTS app_counter_penalty_ai",
+    "DROP TRIGGER IF EXISTS app_counter_penalty_ad",
+    "DROP TRIGGER IF EXISTS app_counter_penalty_au",
+]
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_item_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        # Runs first when unapplied
+        migrations.RunPython(migrations.RunPython.noop, drop_triggers),
+    ]
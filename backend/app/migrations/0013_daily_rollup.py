@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_counter'),
+    ]
+
+    operations = [
+        # Added without a default first so existing requests keep a NULL
+        # (unknown) request time instead of the time of the migration.
+        migrations.AddField(
+            model_name='borrowtransaction',
+            name='requested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='borrowtransaction',
+            name='requested_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('item_type', models.CharField(max_length=50)),
+                ('requested', models.PositiveIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('returned', models.PositiveIntegerField(default=0)),
+                ('overdue', models.PositiveIntegerField(default=0)),
+                ('penalty_issued', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('penalty_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'item_type'), name='unique_rollup_day_item_type')],
+            },
+        ),
+    ]
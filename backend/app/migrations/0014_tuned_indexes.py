@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_daily_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(condition=models.Q(('due_date__isnull', False)), fields=['status', 'due_date'], name='borrow_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['status'], name='borrow_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['user', 'status'], name='borrow_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['requested_at'], name='borrow_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowtransaction',
+            index=models.Index(fields=['borrow_date'], name='borrow_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(fields=['status', 'created_at'], name='penalty_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(fields=['created_at'], name='penalty_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(condition=models.Q(('paid_at__isnull', False)), fields=['paid_at'], name='penalty_paid_idx'),
+        ),
+    ]
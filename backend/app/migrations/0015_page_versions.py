@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:48
+
+from django.db import migrations, models
+
+# The triggers writing page and fragment versions into app_version are
+# created by the post_migrate hook (app/triggers.py); unapplying this
+# migration has to drop them before the table, or every write to the
+# tables they watch fails.
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS app_version_item_ai",
+    "DROP TRIGGER IF EXISTS app_version_item_ad",
+    "DROP TRIGGER IF EXISTS app_version_item_au",
+    "DROP TRIGGER IF EXISTS app_version_item_labels_au",
+    "DROP TRIGGER IF EXISTS app_version_borrow_ai",
+    "DROP TRIGGER IF EXISTS app_version_borrow_ad",
+    "DROP TRIGGER IF EXISTS app_version_borrow_au",
+    "DROP TRIGGER IF EXISTS app_version_fragment_user_ai",
+    "DROP TRIGGER IF EXISTS app_version_fragment_user_ad",
+    "DROP TRIGGER IF EXISTS app_version_fragment_user_au",
+    "DROP TRIGGER IF EXISTS app_version_fragment_item_ai",
+    "DROP TRIGGER IF EXISTS app_version_fragment_item_ad",
+    "DROP TRIGGER IF EXISTS app_version_fragment_profile_ai",
+    "DROP TRIGGER IF EXISTS app_version_fragment_profile_ad",
+    "DROP TRIGGER IF EXISTS app_version_fragment_profile_au",
+    "DROP TRIGGER IF EXISTS app_version_fragment_borrow_ai",
+    "DROP TRIGGER IF EXISTS app_version_fragment_borrow_ad",
+    "DROP TRIGGER IF EXISTS app_version_fragment_borrow_au",
+    "DROP TRIGGER IF EXISTS app_version_fragment_penalty_ai",
+    "DROP TRIGGER IF EXISTS app_version_fragment_penalty_ad",
+    "DROP TRIGGER IF EXISTS app_version_fragment_penalty_au",
+]
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_tuned_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Version',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        # Runs first when unapplied
+        migrations.RunPython(migrations.RunPython.noop, drop_triggers),
+    ]
@@ -49,6 +49,22 @@ class BorrowTransaction(models.Model):
     due_date = models.DateField(null=True, blank=True)
     return_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    requested_at = models.DateTimeField(default=timezone.now, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Overdue sweep and reports: status IN (...) AND due_date < ?.
+            # Only loans that were handed out have a due date.
+            models.Index(fields=['status', 'due_date'], name='borrow_status_due_idx',
+                         condition=models.Q(due_date__isnull=False)),
+            # Status filters and counts, in id order for the admin grid
+            models.Index(fields=['status'], name='borrow_status_idx'),
+            # A user's loans by status (my_borrows, per-user sweep)
+            models.Index(fields=['user', 'status'], name='borrow_user_status_idx'),
+            # Date ranges for the daily rollups and the admin date filter
+            models.Index(fields=['requested_at'], name='borrow_requested_idx'),
+            models.Index(fields=['borrow_date'], name='borrow_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.item.name} ({self.status})"
@@ -75,5 +91,78 @@ class Penalty(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     paid_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Admin list: filtered by status, newest first
+            models.Index(fields=['status', 'created_at'], name='penalty_status_created_idx'),
+            models.Index(fields=['created_at'], name='penalty_created_idx'),
+            # Paid-per-day rollup; unpaid penalties have no paid_at
+            models.Index(fields=['paid_at'], name='penalty_paid_idx', condition=models.Q(paid_at__isnull=False)),
+        ]
+
     def __str__(self):
         return f"{self.borrow_transaction.user.username} - {self.borrow_transaction.item.name} | {self.status}"
+
+
+# ---------------- SweepState ----------------
+class SweepState(models.Model):
+    """Leader lease and watermark for a background job (one row per job)."""
+    name = models.CharField(max_length=50, unique=True)
+    owner = models.CharField(max_length=100, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    last_swept_at = models.DateTimeField(null=True, blank=True)
+    last_duration_ms = models.FloatField(default=0)
+    last_overdue = models.PositiveIntegerField(default=0)
+    last_penalties = models.PositiveIntegerField(default=0)
+    runs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} (last swept {self.last_swept_at})"
+
+
+# ---------------- Counter ----------------
+class Counter(models.Model):
+    """
+    Running totals for the dashboard and reports (e.g. 'borrows:Pending',
+    'penalties:Paid'). Kept current by database triggers, see app/counters.py.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
+
+# ---------------- Version ----------------
+class Version(models.Model):
+    """
+    Change counter for the rows a cached page shows (e.g. 'items',
+    'borrows:42'). Bumped by database triggers, see app/etags.py.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+# ---------------- DailyRollup ----------------
+class DailyRollup(models.Model):
+    """Borrowing and penalty activity for one item type on one (closed) day."""
+    day = models.DateField()
+    item_type = models.CharField(max_length=50)
+    requested = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    returned = models.PositiveIntegerField(default=0)
+    overdue = models.PositiveIntegerField(default=0)
+    penalty_issued = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    penalty_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'item_type'], name='unique_rollup_day_item_type'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.item_type}"
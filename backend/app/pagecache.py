@@ -0,0 +1,120 @@
+import gzip
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:  # optional: without it the pages are offered as gzip only
+    brotli = None
+
+CACHE_ALIAS = 'pages'
+CODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+# What {% csrf_token %} renders; its value is per visitor
+CSRF_INPUT = re.compile(rb'(<input type="hidden" name="csrfmiddlewaretoken" value=")[^"]*(">)')
+CSRF_PLACEHOLDER = b'\x00csrf\x00'
+
+
+# --------- Public Page Cache ---------
+# The public pages are the same for every anonymous visitor, so they are
+# rendered once per process (or once per deploy with a shared cache, see
+# warm_page_cache) and kept with their gzip and brotli encodings. The one
+# per-visitor bit, the CSRF token of the sign-in and sign-up forms, is
+# stored as a placeholder and filled in per request; those pages are then
+# compressed per request too, which costs far less than rendering them.
+def compress(body, coding, fast=False):
+    """``body`` in content coding ``coding`` ('br' or 'gzip')."""
+    if coding == 'br':
+        return brotli.compress(body, quality=5 if fast else 11)
+    return gzip.compress(body, compresslevel=6 if fast else 9, mtime=0)
+
+
+def _entry(response):
+    body = CSRF_INPUT.sub(rb'\1' + CSRF_PLACEHOLDER + rb'\2', response.content)
+    personal = CSRF_PLACEHOLDER in body
+    bodies = {'identity': body}
+    if not personal:
+        bodies.update((coding, compress(body, coding)) for coding in CODINGS)
+    return {'content_type': response['Content-Type'], 'personal': personal, 'bodies': bodies}
+
+
+def accepted_coding(request):
+    """The best of our encodings the client accepts, or None for identity."""
+    weights = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        coding, params = coding.strip().lower(), params.strip().replace(' ', '')
+        try:
+            weights[coding] = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            weights[coding] = 0.0
+    for coding in CODINGS:
+        if weights.get(coding, weights.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+
+def _respond(request, entry):
+    coding = accepted_coding(request)
+    if entry['personal']:
+        body = entry['bodies']['identity'].replace(CSRF_PLACEHOLDER, get_token(request).encode())
+        if coding:
+            body = compress(body, coding, fast=True)
+    else:
+        body = entry['bodies'][coding or 'identity']
+    response = HttpResponse(body, content_type=entry['content_type'])
+    if coding:
+        response['Content-Encoding'] = coding
+    response['Content-Length'] = str(len(body))
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    if entry['personal']:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.PUBLIC_PAGE_MAX_AGE)
+    return response
+
+
+def page_key(name):
+    # Not the path: app.urls is mounted at / and /accounts/ with the same pages
+    return f'public-page:{name}'
+
+
+def public_page(view):
+    """
+    Serve anonymous GETs of a view that renders the same page for every
+    visitor from the page cache. Signed-in users and other methods go
+    straight to the view.
+    """
+    name = view.__name__
+
+    def fill(request, *args, **kwargs):
+        # Render and store the page; the response is returned when it is not cacheable
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return None, response
+        entry = _entry(response)
+        caches[CACHE_ALIAS].set(page_key(name), entry, settings.PUBLIC_PAGE_SECONDS)
+        return entry, response
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        entry = caches[CACHE_ALIAS].get(page_key(name))
+        metrics.inc('borrowlink_page_cache_total', page=name, result='miss' if entry is None else 'hit')
+        if entry is None:
+            entry, response = fill(request, *args, **kwargs)
+            if entry is None:
+                return response
+        return _respond(request, entry)
+
+    wrapper.fill = fill
+    return wrapper
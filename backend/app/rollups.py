@@ -0,0 +1,130 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import BorrowTransaction, Penalty, DailyRollup, SweepState
+
+ROLLUP_JOB = 'daily_rollup'
+ROLLUP_FIELDS = ['requested', 'approved', 'returned', 'overdue', 'penalty_issued', 'penalty_paid']
+WINDOW_DAYS = 90
+BUCKETS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def _bounds(first_day, last_day):
+    # Half-open datetime range covering whole days, so indexes on the raw
+    # timestamp columns can be used
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first_day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+# --------- Daily Rollups ---------
+def aggregate_days(first_day, last_day):
+    """
+    Per (day, item type) activity between two dates, inclusive, from five
+    GROUP BY queries over the raw tables.
+    """
+    start, end = _bounds(first_day, last_day)
+    rows = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+
+    requested = (BorrowTransaction.objects.filter(requested_at__gte=start, requested_at__lt=end)
+                 .annotate(day=TruncDate('requested_at')).values_list('day', 'item__item_type')
+                 .annotate(n=Count('id')).order_by())
+    for day, item_type, n in requested:
+        rows[day, item_type]['requested'] = n
+
+    approved = (BorrowTransaction.objects.filter(borrow_date__range=(first_day, last_day))
+                .values_list('borrow_date', 'item__item_type').annotate(n=Count('id')).order_by())
+    for day, item_type, n in approved:
+        rows[day, item_type]['approved'] = n
+
+    returned = (BorrowTransaction.objects.filter(status='Returned', return_date__range=(first_day, last_day))
+                .values_list('return_date', 'item__item_type').annotate(n=Count('id')).order_by())
+    for day, item_type, n in returned:
+        rows[day, item_type]['returned'] = n
+
+    # A penalty is issued on the day its loan goes overdue
+    issued = (Penalty.objects.filter(created_at__gte=start, created_at__lt=end)
+              .annotate(day=TruncDate('created_at'))
+              .values_list('day', 'borrow_transaction__item__item_type')
+              .annotate(n=Count('id'), total=Sum('amount')).order_by())
+    for day, item_type, n, total in issued:
+        rows[day, item_type]['overdue'] = n
+        rows[day, item_type]['penalty_issued'] = total or 0
+
+    paid = (Penalty.objects.filter(status='Paid', paid_at__gte=start, paid_at__lt=end)
+            .annotate(day=TruncDate('paid_at'))
+            .values_list('day', 'borrow_transaction__item__item_type')
+            .annotate(total=Sum('amount')).order_by())
+    for day, item_type, total in paid:
+        rows[day, item_type]['penalty_paid'] = total or 0
+
+    return rows
+
+
+def _first_activity_day():
+    firsts = [
+        BorrowTransaction.objects.aggregate(d=Min('requested_at'))['d'],
+        BorrowTransaction.objects.aggregate(d=Min('borrow_date'))['d'],
+        Penalty.objects.aggregate(d=Min('created_at'))['d'],
+    ]
+    days = [timezone.localdate(d) if isinstance(d, datetime) else d for d in firsts if d]
+    return min(days) if days else None
+
+
+def roll_up(today=None, rebuild=False):
+    """
+    Roll up every closed day (before ``today``) that has not been rolled up
+    yet, in windows of WINDOW_DAYS, advancing the watermark after each window
+    so an interrupted run resumes where it stopped. Returns the days processed.
+    """
+    today = today or timezone.localdate()
+    state, _ = SweepState.objects.get_or_create(name=ROLLUP_JOB)
+    if rebuild:
+        DailyRollup.objects.all().delete()
+        state.last_swept_at = None
+
+    if state.last_swept_at:
+        first_day = timezone.localdate(state.last_swept_at) + timedelta(days=1)
+    else:
+        first_day = _first_activity_day()
+    last_day = today - timedelta(days=1)
+    if first_day is None or first_day > last_day:
+        return 0
+
+    processed = 0
+    while first_day <= last_day:
+        window_end = min(first_day + timedelta(days=WINDOW_DAYS - 1), last_day)
+        rows = aggregate_days(first_day, window_end)
+        DailyRollup.objects.bulk_create(
+            [DailyRollup(day=day, item_type=item_type, **values) for (day, item_type), values in rows.items()],
+            update_conflicts=True, unique_fields=['day', 'item_type'], update_fields=ROLLUP_FIELDS,
+        )
+        # The watermark is the start of the last closed day rolled up
+        SweepState.objects.filter(name=ROLLUP_JOB).update(
+            last_swept_at=_bounds(window_end, window_end)[0], runs=F('runs') + 1,
+        )
+        processed += (window_end - first_day).days + 1
+        first_day = window_end + timedelta(days=1)
+    return processed
+
+
+# --------- Time Series ---------
+def time_series(fields, bucket='day', first_day=None, last_day=None, item_type=None, by_item_type=False):
+    """Sum rollup ``fields`` per day/week/month bucket, optionally split by item type."""
+    rollups = DailyRollup.objects.all()
+    if first_day:
+        rollups = rollups.filter(day__gte=first_day)
+    if last_day:
+        rollups = rollups.filter(day__lte=last_day)
+    if item_type:
+        rollups = rollups.filter(item_type=item_type)
+
+    trunc = BUCKETS[bucket]
+    rollups = rollups.annotate(period=trunc('day') if trunc else F('day'))
+    group = ['period', 'item_type'] if by_item_type else ['period']
+    return list(rollups.values(*group).annotate(**{field: Sum(field) for field in fields}).order_by(*group))
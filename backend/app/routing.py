@@ -0,0 +1,112 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+REPLICA = 'replica'
+PIN_COOKIE = 'db_pin'
+
+# Per-request routing state; a ContextVar so it follows the request under ASGI
+_state = ContextVar('db_routing', default=None)
+
+
+class _Routing:
+    __slots__ = ('request', 'wrote')
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+
+    @property
+    def read_only(self):
+        # Looked up on first use: the view is only known once the URL resolved
+        match = getattr(self.request, 'resolver_match', None)
+        return (match is not None and getattr(match.func, 'read_only_db', False)
+                and PIN_COOKIE not in self.request.COOKIES)
+
+
+def read_only(view):
+    """Mark a view whose reads may be served by the replica."""
+    view.read_only_db = True
+    return view
+
+
+# --------- Router ---------
+class ReadReplicaRouter:
+    """
+    Writes always go to the primary. Reads go to the replica only inside a
+    view marked @read_only, and only when the client has not written
+    recently and no transaction is open on the primary (a sweep inside a
+    read-only page must read what it is about to update).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.read_only or state.wrote:
+            return 'default'
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary made by sync_replica
+        return db == 'default'
+
+
+# --------- Middleware ---------
+class ReplicaRoutingMiddleware:
+    """
+    Tracks whether the request may read from the replica. A POST that
+    writes sets a short-lived cookie, and until it expires the same client
+    reads from the primary, so it always sees its own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _Routing(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = _Routing(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._pin(request, response, state)
+
+    @staticmethod
+    def _pin(request, response, state):
+        # Only the client's own writes pin it; a GET that runs the overdue
+        # sweep changes shared state, not something this client must see
+        if state.wrote and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
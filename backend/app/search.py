@@ -0,0 +1,65 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+
+from .grids import GridPage
+from .models import Item
+
+FTS_TABLE = 'app_item_fts'
+_WORD = re.compile(r'\w+')
+
+
+# --------- Catalogue Search (SQLite FTS5) ---------
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query where every word is a quoted prefix match."""
+    return ' '.join(f'"{word}"*' for word in _WORD.findall(text))
+
+
+def search_items(text, limit=24, offset=0, in_stock=True):
+    """
+    Items matching ``text`` on name, type or serial number, best match first.
+    Uses the app_item_fts index (kept in sync by triggers, see app/triggers.py).
+    """
+    match = fts_query(text)
+    if not match:
+        return []
+
+    if not fts_available():
+        items = Item.objects.all()
+        for word in _WORD.findall(text):
+            items = items.filter(
+                Q(name__icontains=word) | Q(item_type__icontains=word) | Q(serial_number__icontains=word)
+            )
+        if in_stock:
+            items = items.filter(stock__gt=0)
+        return list(items.order_by('name', 'id')[offset:offset + limit])
+
+    stock_clause = 'AND app_item.stock > 0' if in_stock else ''
+    return list(Item.objects.raw(
+        f"SELECT app_item.* FROM {FTS_TABLE} "
+        f"JOIN app_item ON app_item.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s {stock_clause} "
+        f"ORDER BY {FTS_TABLE}.rank LIMIT %s OFFSET %s",
+        [match, limit, offset],
+    ))
+
+
+def search_page(request, page_size=24):
+    """One page of ranked results for ?q=, shaped like a Grid page (the cursor is the offset)."""
+    cursor = request.GET.get('cursor', '')
+    offset = int(cursor) if cursor.isdigit() else 0
+    rows = search_items(request.GET.get('q', ''), limit=page_size + 1, offset=offset)
+    next_cursor = str(offset + page_size) if len(rows) > page_size else None
+    return GridPage(rows[:page_size], request.GET, cursor or None, next_cursor, sort='rank')
+
+
+def rebuild_index(using='default'):
+    """Rebuild the index from app_item, e.g. after its sync triggers were missing."""
+    if connections[using].vendor == 'sqlite':
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
@@ -0,0 +1,177 @@
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Profile, Item, BorrowTransaction, Penalty
+from .services import LOAN_DAYS, PENALTY_PER_DAY
+
+BATCH_ROWS = 5000
+SEED_PASSWORD = 'borrowlink'
+DEPARTMENTS = ['IT', 'CS', 'Engineering', 'Education', 'Nursing', 'Business', 'Arts', 'Criminology']
+ITEM_TYPES = {
+    'Electronics': ['Laptop', 'Projector', 'Tablet', 'Camera', 'Speaker', 'Extension Cord', 'HDMI Cable'],
+    'Laboratory': ['Microscope', 'Beaker Set', 'Multimeter', 'Oscilloscope', 'Breadboard Kit'],
+    'Sports': ['Basketball', 'Volleyball', 'Badminton Set', 'Chess Board', 'Table Tennis Set'],
+    'Office': ['Stapler', 'Whiteboard', 'Paper Cutter', 'Laminator', 'Calculator'],
+}
+# Borrow status mix: (status, weight)
+STATUS_MIX = [('Returned', 55), ('Rejected', 10), ('Pending', 12), ('Borrowed', 15), ('Overdue', 8)]
+HISTORY_DAYS = 365
+
+
+@dataclass
+class SeedResult:
+    users: int = 0
+    items: int = 0
+    borrows: int = 0
+    penalties: int = 0
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+@contextmanager
+def _explicit_created_at():
+    # Penalty.created_at is auto_now_add; seeded penalties need their real dates
+    field = Penalty._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _at(day, rng):
+    moment = datetime.combine(day, time(8)) + timedelta(seconds=rng.randrange(10 * 3600))
+    return timezone.make_aware(moment)
+
+
+# --------- Generators ---------
+def seed_users(count, rng, batch_size=BATCH_ROWS):
+    """Users with profiles; all share one password hash, so no hashing cost per row."""
+    offset = User.objects.count()
+    password = make_password(SEED_PASSWORD)
+    for start, size in _chunks(count, batch_size):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'load{offset + start + i:07d}', email=f'load{offset + start + i:07d}@example.com',
+                     password=password)
+                for i in range(size)
+            ])
+            Profile.objects.bulk_create([
+                Profile(user=user, department=rng.choice(DEPARTMENTS), id_number=f'{2020 + rng.randrange(6)}-{user.id:06d}',
+                        contact_number=f'09{rng.randrange(10 ** 9):09d}')
+                for user in users
+            ])
+    return count
+
+
+def seed_items(count, rng, batch_size=BATCH_ROWS):
+    offset = Item.objects.count()
+    types = list(ITEM_TYPES)
+    for start, size in _chunks(count, batch_size):
+        items = []
+        for i in range(size):
+            item_type = rng.choice(types)
+            items.append(Item(
+                name=f'{rng.choice(ITEM_TYPES[item_type])} {offset + start + i}',
+                item_type=item_type,
+                serial_number=f'LOAD-{offset + start + i:08d}',
+                condition='Under Maintenance' if rng.random() < 0.03 else 'Available',
+                stock=rng.randrange(0, 21),
+            ))
+        with transaction.atomic():
+            Item.objects.bulk_create(items)
+    return count
+
+
+def _borrow(user_id, item_id, rng, today):
+    status = rng.choices([status for status, _ in STATUS_MIX], [weight for _, weight in STATUS_MIX])[0]
+    borrow = BorrowTransaction(user_id=user_id, item_id=item_id, status=status,
+                               quantity=1 if rng.random() < 0.9 else rng.randrange(2, 4))
+    if status == 'Pending':
+        requested = today - timedelta(days=rng.randrange(3))
+    elif status == 'Borrowed':
+        # Still inside the loan window
+        requested = today - timedelta(days=rng.randrange(LOAN_DAYS))
+        borrow.borrow_date = requested
+        borrow.due_date = requested + timedelta(days=LOAN_DAYS)
+    elif status == 'Overdue':
+        requested = today - timedelta(days=rng.randrange(LOAN_DAYS + 1, 45))
+        borrow.borrow_date = requested
+        borrow.due_date = requested + timedelta(days=LOAN_DAYS)
+        borrow.return_date = borrow.due_date + timedelta(days=1)
+    elif status == 'Returned':
+        requested = today - timedelta(days=rng.randrange(LOAN_DAYS + 7, HISTORY_DAYS))
+        borrow.borrow_date = requested + timedelta(days=rng.randrange(2))
+        borrow.due_date = borrow.borrow_date + timedelta(days=LOAN_DAYS)
+        # One in ten comes back late
+        late = rng.random() < 0.1
+        borrow.return_date = borrow.due_date + timedelta(days=rng.randrange(1, 6) if late else -rng.randrange(LOAN_DAYS))
+    else:
+        requested = today - timedelta(days=rng.randrange(HISTORY_DAYS))
+    borrow.requested_at = _at(requested, rng)
+    return borrow
+
+
+def _penalty(borrow, rng, today):
+    if borrow.status == 'Overdue':
+        return Penalty(borrow_transaction_id=borrow.id, status='Unpaid',
+                       amount=Decimal((today - borrow.due_date).days * PENALTY_PER_DAY),
+                       created_at=_at(borrow.due_date + timedelta(days=1), rng))
+    if borrow.status == 'Returned' and borrow.return_date > borrow.due_date:
+        return Penalty(borrow_transaction_id=borrow.id, status='Paid',
+                       amount=Decimal((borrow.return_date - borrow.due_date).days * PENALTY_PER_DAY),
+                       created_at=_at(borrow.due_date + timedelta(days=1), rng),
+                       paid_at=_at(borrow.return_date, rng))
+    return None
+
+
+def seed_borrows(count, rng, batch_size=BATCH_ROWS, today=None):
+    """
+    Borrows spread over the last year in STATUS_MIX proportions, with the
+    penalties they imply. A few items and users get most of the traffic.
+    """
+    today = today or timezone.localdate()
+    user_ids = list(User.objects.filter(is_staff=False).values_list('id', flat=True))
+    item_ids = list(Item.objects.values_list('id', flat=True))
+    if not user_ids or not item_ids:
+        return 0, 0
+
+    penalties = 0
+    with _explicit_created_at():
+        for _, size in _chunks(count, batch_size):
+            rows = [
+                _borrow(user_ids[int(len(user_ids) * rng.random() ** 1.5)],
+                        item_ids[int(len(item_ids) * rng.random() ** 2)], rng, today)
+                for _ in range(size)
+            ]
+            with transaction.atomic():
+                rows = BorrowTransaction.objects.bulk_create(rows)
+                issued = [penalty for penalty in (_penalty(borrow, rng, today) for borrow in rows) if penalty]
+                Penalty.objects.bulk_create(issued)
+            penalties += len(issued)
+    return count, penalties
+
+
+def seed(users, items, borrows, seed=42, batch_size=BATCH_ROWS, today=None):
+    """Generate a dataset; the same arguments always produce the same rows."""
+    rng = random.Random(seed)
+    if connection.vendor == 'sqlite':
+        # Throwaway load data: skip the fsync per transaction
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = OFF')
+    result = SeedResult()
+    result.users = seed_users(users, rng, batch_size)
+    result.items = seed_items(items, rng, batch_size)
+    result.borrows, result.penalties = seed_borrows(borrows, rng, batch_size, today)
+    return result
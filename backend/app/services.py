@@ -0,0 +1,361 @@
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import OperationalError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import metrics
+from .models import Item, BorrowTransaction, Penalty, SweepState
+
+logger = logging.getLogger(__name__)
+
+# Statuses that count as "out on loan" for the overdue sweep
+ACTIVE_STATUSES = ['Borrowed', 'Approved']
+PENALTY_PER_DAY = 50
+LOAN_DAYS = 3
+OVERDUE_SWEEP = 'overdue'
+SWEEP_BACKOFF = 0.05  # seconds, times the attempt number
+
+
+class SweepConflict(Exception):
+    """Another sweep changed the candidate rows while this one was running."""
+
+
+class Refused(Exception):
+    """A stock or status precondition failed; the transaction is rolled back."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@dataclass
+class Reservation:
+    ok: bool
+    reason: str = ''      # 'status' or 'stock' when refused
+
+
+@dataclass
+class BatchApproval:
+    # borrow id -> 'approved', 'stock' (not enough left) or 'status' (not Pending / missing)
+    results: dict = field(default_factory=dict)
+    conflicted: bool = False  # every attempt lost a race; nothing was approved
+
+    @property
+    def approved(self):
+        return sum(1 for outcome in self.results.values() if outcome == 'approved')
+
+
+@dataclass
+class SweepResult:
+    overdue: int = 0      # borrows flipped to Overdue
+    penalties: int = 0    # penalties created
+    items: int = 0        # items whose stock was returned
+
+
+# --------- Stock Reservation ---------
+# Every stock change is a single guarded UPDATE and every status change is a
+# compare-and-set on the status the caller last saw, so concurrent admins can
+# neither oversell an item nor apply the same transition twice.
+def _take_stock(item_id, quantity):
+    return Item.objects.filter(id=item_id, stock__gte=quantity).update(stock=F('stock') - quantity) == 1
+
+
+def _put_stock(item_id, quantity):
+    Item.objects.filter(id=item_id).update(stock=F('stock') + quantity)
+
+
+def _compare_and_set(borrow, from_statuses, **changes):
+    return BorrowTransaction.objects.filter(id=borrow.id, status__in=from_statuses).update(**changes) == 1
+
+
+def reserve_stock(borrow, today=None, mark_empty=False):
+    """
+    Approve ``borrow``: move it from the status it was read with to Borrowed
+    and take its quantity out of stock, or do neither.
+    """
+    if borrow.status == 'Borrowed':
+        return Reservation(False, 'status')
+    today = today or timezone.now().date()
+    try:
+        with transaction.atomic():
+            if not _compare_and_set(borrow, [borrow.status], status='Borrowed',
+                                    borrow_date=today, due_date=today + timedelta(days=LOAN_DAYS)):
+                raise Refused('status')
+            if not _take_stock(borrow.item_id, borrow.quantity):
+                raise Refused('stock')
+            if mark_empty:
+                Item.objects.filter(id=borrow.item_id, stock=0).update(condition='Borrowed')
+    except Refused as refused:
+        return Reservation(False, refused.reason)
+
+    metrics.inc_on_commit('borrowlink_approvals_total')
+    borrow.status = 'Borrowed'
+    borrow.borrow_date = today
+    borrow.due_date = today + timedelta(days=LOAN_DAYS)
+    return Reservation(True)
+
+
+def return_borrow(borrow, today=None, mark_available=False):
+    """Return an active or overdue loan: stock goes back and its penalty is marked paid."""
+    if borrow.status not in ('Borrowed', 'Overdue'):
+        return Reservation(False, 'status')
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        if not _compare_and_set(borrow, [borrow.status], status='Returned', return_date=today):
+            return Reservation(False, 'status')
+        # An overdue loan already had its stock put back by the sweep
+        if borrow.status != 'Overdue':
+            _put_stock(borrow.item_id, borrow.quantity)
+        if mark_available:
+            Item.objects.filter(id=borrow.item_id, stock__gt=0).update(condition='Available')
+        Penalty.objects.filter(borrow_transaction_id=borrow.id, status='Unpaid').update(
+            status='Paid', paid_at=timezone.now(),
+        )
+        metrics.inc_on_commit('borrowlink_returns_total')
+    borrow.status = 'Returned'
+    borrow.return_date = today
+    return Reservation(True)
+
+
+def mark_overdue(borrow, today=None):
+    """Manually flag a loan as overdue: stock goes back and a penalty is issued."""
+    if borrow.status == 'Overdue':
+        return Reservation(False, 'status')
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        if not _compare_and_set(borrow, [borrow.status], status='Overdue', return_date=today):
+            return Reservation(False, 'status')
+        _put_stock(borrow.item_id, borrow.quantity)
+        Item.objects.filter(id=borrow.item_id, stock__gt=0).update(condition='Available')
+        if not Penalty.objects.filter(borrow_transaction_id=borrow.id).exists():
+            days_overdue = (today - borrow.due_date).days if borrow.due_date else 0
+            Penalty.objects.create(borrow_transaction_id=borrow.id,
+                                   amount=Decimal(max(days_overdue, 1) * PENALTY_PER_DAY))
+            metrics.inc_on_commit('borrowlink_penalties_created_total')
+    borrow.status = 'Overdue'
+    borrow.return_date = today
+    return Reservation(True)
+
+
+def change_status(borrow, status):
+    """
+    Any other status change (back to Pending, Rejected, ...). A loan that
+    stops being Borrowed gives its stock back.
+    """
+    with transaction.atomic():
+        if not _compare_and_set(borrow, [borrow.status], status=status):
+            return Reservation(False, 'status')
+        if borrow.status == 'Borrowed':
+            _put_stock(borrow.item_id, borrow.quantity)
+    borrow.status = status
+    return Reservation(True)
+
+
+def cancel_overdue(borrow):
+    """
+    Undo an overdue flag: the loan counts as Returned and its penalty is
+    dropped. The stock went back when it was flagged, so only the item's
+    condition may change.
+    """
+    if borrow.status != 'Overdue':
+        return Reservation(False, 'status')
+    with transaction.atomic():
+        if not _compare_and_set(borrow, ['Overdue'], status='Returned'):
+            return Reservation(False, 'status')
+        Item.objects.filter(id=borrow.item_id, stock__gt=0).update(condition='Available')
+        Penalty.objects.filter(borrow_transaction_id=borrow.id).delete()
+    borrow.status = 'Returned'
+    return Reservation(True)
+
+
+# --------- Batch Approval ---------
+def approve_pending(borrow_ids=None, item_id=None, today=None, attempts=3):
+    """
+    Approve a batch of Pending requests, either the given ``borrow_ids`` or
+    every Pending request for ``item_id``, in one transaction. Each item's
+    stock is handed out first-come-first-served by request id; whatever does
+    not fit stays Pending, and an item left with no stock is marked Borrowed.
+    If every attempt loses a race with another approval, nothing is approved
+    and the result is ``conflicted``.
+
+    The database work is one SELECT for the requests, one for the stock, one
+    guarded UPDATE per item, one UPDATE for the emptied items and one UPDATE
+    for all approved requests.
+    """
+    for _ in range(attempts):
+        try:
+            return _approve_pending_once(borrow_ids, item_id, today or timezone.now().date())
+        except Refused:
+            pass
+    return BatchApproval(conflicted=True)
+
+
+def _approve_pending_once(borrow_ids, item_id, today):
+    pending = BorrowTransaction.objects.filter(status='Pending')
+    if borrow_ids is not None:
+        pending = pending.filter(id__in=borrow_ids)
+    if item_id is not None:
+        pending = pending.filter(item_id=item_id)
+
+    batch = BatchApproval()
+    with transaction.atomic():
+        rows = list(pending.select_for_update().order_by('id').values_list('id', 'item_id', 'quantity'))
+        stock = dict(
+            Item.objects.select_for_update().filter(id__in={row[1] for row in rows}).values_list('id', 'stock')
+        )
+
+        remaining = dict(stock)
+        approved = []
+        for borrow_id, borrow_item_id, quantity in rows:
+            if remaining[borrow_item_id] >= quantity:
+                remaining[borrow_item_id] -= quantity
+                approved.append(borrow_id)
+                batch.results[borrow_id] = 'approved'
+            else:
+                batch.results[borrow_id] = 'stock'
+
+        emptied = []
+        for stock_item_id, left in remaining.items():
+            taken = stock[stock_item_id] - left
+            if taken and not _take_stock(stock_item_id, taken):
+                raise Refused('stock')
+            if taken and not left:
+                emptied.append(stock_item_id)
+        # As reserve_stock(mark_empty=True) does for a single approval
+        if emptied:
+            Item.objects.filter(id__in=emptied, stock=0).update(condition='Borrowed')
+        if approved:
+            flipped = BorrowTransaction.objects.filter(id__in=approved, status='Pending').update(
+                status='Borrowed', borrow_date=today, due_date=today + timedelta(days=LOAN_DAYS),
+            )
+            # Lost a race with a single approval or another batch: start over
+            if flipped != len(approved):
+                raise Refused('status')
+            metrics.inc_on_commit('borrowlink_approvals_total', len(approved))
+
+    for borrow_id in borrow_ids or ():
+        batch.results.setdefault(borrow_id, 'status')
+    return batch
+
+
+# --------- Overdue Sweep ---------
+def sweep_overdue(user=None, today=None, attempts=3):
+    """
+    Flip every overdue active borrow to Overdue, give its stock back and
+    create the missing penalties, all in one transaction.
+
+    Runs a fixed number of statements no matter how many loans are active:
+    one SELECT, one UPDATE for the borrows, one UPDATE per affected item and
+    one bulk INSERT for the penalties (split only at the backend's parameter
+    limit, every 199 rows on SQLite). If a concurrent sweep gets to some of
+    the rows first, or holds the SQLite write lock past busy_timeout (the
+    default profile's deferred transactions take it only at the UPDATE),
+    the transaction is rolled back and retried.
+    """
+    today = today or timezone.now().date()
+    for attempt in range(attempts):
+        try:
+            return _sweep_once(user, today)
+        except (SweepConflict, OperationalError) as error:
+            if not _retryable(error) or attempt == attempts - 1:
+                raise
+            time.sleep(SWEEP_BACKOFF * (attempt + 1))
+
+
+def _retryable(error):
+    return isinstance(error, SweepConflict) or 'locked' in str(error)
+
+
+def _sweep_once(user, today):
+    overdue = BorrowTransaction.objects.filter(status__in=ACTIVE_STATUSES, due_date__lt=today)
+    if user is not None:
+        overdue = overdue.filter(user=user)
+
+    with transaction.atomic():
+        # Row locks where the backend has them (no-op on SQLite, whose
+        # writer lock already serialises the transaction).
+        candidates = overdue.select_for_update(of=('self',))
+        rows = list(candidates.values_list('id', 'item_id', 'quantity', 'due_date', 'penalty__id'))
+        if not rows:
+            return SweepResult()
+
+        # Same predicate as the SELECT, so the row count doubles as a
+        # compare-and-set: a mismatch means someone else got there first.
+        flipped = overdue.update(status='Overdue', return_date=today)
+        if flipped != len(rows):
+            raise SweepConflict(f"expected to flip {len(rows)} borrows, flipped {flipped}")
+
+        returned = defaultdict(int)
+        for _, item_id, quantity, _, _ in rows:
+            returned[item_id] += quantity
+        for item_id, quantity in returned.items():
+            Item.objects.filter(id=item_id).update(stock=F('stock') + quantity)
+
+        penalties = Penalty.objects.bulk_create([
+            Penalty(
+                borrow_transaction_id=borrow_id,
+                amount=Decimal((today - due_date).days * PENALTY_PER_DAY),
+            )
+            for borrow_id, _, _, due_date, penalty_id in rows
+            if penalty_id is None
+        ])
+        metrics.inc_on_commit('borrowlink_penalties_created_total', len(penalties))
+
+    return SweepResult(overdue=flipped, penalties=len(penalties), items=len(returned))
+
+
+# --------- Sweep Worker ---------
+def acquire_sweep_lease(owner, seconds, now=None):
+    """
+    Take (or renew) the leader lease for the overdue sweep. Only one worker
+    holds it at a time; an expired lease can be taken over by anyone.
+    """
+    now = now or timezone.now()
+    SweepState.objects.get_or_create(name=OVERDUE_SWEEP)
+    taken = SweepState.objects.filter(name=OVERDUE_SWEEP).filter(
+        Q(owner=owner) | Q(lease_until__isnull=True) | Q(lease_until__lt=now)
+    ).update(owner=owner, lease_until=now + timedelta(seconds=seconds))
+    return taken == 1
+
+
+def release_sweep_lease(owner):
+    SweepState.objects.filter(name=OVERDUE_SWEEP, owner=owner).update(owner='', lease_until=None)
+
+
+def run_scheduled_sweep(owner, lease_seconds, min_gap=0, now=None):
+    """
+    Run one sweep if ``owner`` is the leader and the last one started at
+    least ``min_gap`` seconds ago, then record the watermark and the run
+    metrics. Returns the SweepResult, or None when not the leader or not due.
+    """
+    now = now or timezone.now()
+    if not acquire_sweep_lease(owner, lease_seconds, now):
+        return None
+    # A restarted worker, or a --once run next to the daemon, would sweep twice in a row
+    last = SweepState.objects.filter(name=OVERDUE_SWEEP).values_list('last_swept_at', flat=True).first()
+    if last and now - last < timedelta(seconds=min_gap):
+        return None
+
+    started_at = now
+    started = time.perf_counter()
+    result = sweep_overdue(today=now.date())
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    SweepState.objects.filter(name=OVERDUE_SWEEP, owner=owner).update(
+        last_swept_at=started_at,
+        last_duration_ms=duration_ms,
+        last_overdue=result.overdue,
+        last_penalties=result.penalties,
+        runs=F('runs') + 1,
+    )
+    logger.info(
+        "overdue sweep: %d overdue, %d penalties, %d items in %.1fms",
+        result.overdue, result.penalties, result.items, duration_ms,
+    )
+    return result
@@ -0,0 +1,56 @@
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from .pagecache import CODINGS, compress
+
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.html')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic writes every asset under a name with its content hash
+    (css/site.3f2a81c0d9e4.css), listed in staticfiles.json, and each text
+    asset again as .gz (and .br with the brotli package) beside it, so a
+    server can send the compressed copy as is and let browsers keep the
+    file forever: a changed file gets a new name.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.append(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in set(hashed):
+            if name.endswith(COMPRESSIBLE):
+                self._precompress(name)
+
+    def _precompress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as handle:
+            body = handle.read()
+        for coding in CODINGS:
+            packed = compress(body, coding)
+            target = path + SUFFIXES[coding]
+            # Not worth a file when it is no smaller
+            if len(packed) < len(body):
+                with open(target, 'wb') as handle:
+                    handle.write(packed)
+            elif os.path.exists(target):
+                os.remove(target)
+
+    def stored_name(self, name):
+        # Before collectstatic has run (tests, a fresh checkout) nothing is
+        # fingerprinted yet, and the plain name is the only one there is
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def fingerprinted(self, name):
+        """Whether ``name`` is a hashed name from the manifest, safe to cache forever."""
+        return name in self.hashed_files.values()
@@ -0,0 +1,62 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+CHUNK_ROWS = 500
+STREAM_MARKER = mark_safe('<!-- streamed rows -->')
+
+
+# --------- Streaming Render ---------
+# A page with a table of every row is rendered once with a marker where the
+# rows go (templates put `{{ stream_marker }}` in place of their rows
+# include). Everything up to the marker is sent at once; the rows follow a
+# chunk at a time from a chunked cursor, then the rest of the page. Only one
+# chunk of rows and its HTML are in memory at any time, however long the table.
+def _chunks(request, rows_template, name, rows):
+    template = get_template(rows_template)
+    rows = rows.iterator(chunk_size=CHUNK_ROWS)
+    sent = False
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        # An empty chunk only when there were no rows at all, for the {% empty %} branch
+        if not chunk and sent:
+            return
+        yield template.render({name: chunk}, request)
+        if not chunk:
+            return
+        sent = True
+
+
+async def _pulled(chunks):
+    # Under ASGI a sync iterator would be read to the end before sending;
+    # this reads it a chunk at a time in the thread that holds the cursor
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+
+def stream_table(request, template_name, context, rows_template, name, rows):
+    """
+    Render ``template_name`` with every row of queryset ``rows`` (the
+    template's ``name``), rendering them with ``rows_template`` as they are
+    read. The queryset should select_related whatever the rows show.
+    """
+    page = render_to_string(template_name, {**context, 'stream_marker': STREAM_MARKER}, request)
+    head, tail = page.split(STREAM_MARKER, 1)
+    # Fix the database now: the rows are read after the view has returned,
+    # outside the request's routing (replica for read-only views)
+    rows = rows.using(rows.db)
+
+    def parts():
+        yield head
+        yield from _chunks(request, rows_template, name, rows)
+        yield tail
+
+    response = StreamingHttpResponse(_pulled(parts()) if isinstance(request, ASGIRequest) else parts(),
+                                     content_type='text/html; charset=utf-8')
+    # nginx would otherwise hold the head back until it has buffered the rows
+    response['X-Accel-Buffering'] = 'no'
+    return response
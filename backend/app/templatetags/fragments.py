@@ -0,0 +1,34 @@
+from django import template
+
+from app.fragments import cached_fragment
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, sources):
+        self.nodelist = nodelist
+        self.name = name
+        self.sources = sources
+
+    def render(self, context):
+        user = context['request'].user
+        return cached_fragment(
+            self.name.resolve(context),
+            [source.resolve(context) for source in self.sources],
+            user.pk,
+            lambda: self.nodelist.render(context),
+            # Shared by the fragments of one page render
+            context.render_context.setdefault(FragmentNode, {}),
+        )
+
+
+@register.tag
+def fragment(parser, token):
+    """{% fragment 'dashboard-profile' 'user:{user}' %}...{% endfragment %}"""
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and at least one version name")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,11 @@
+from django import template
+
+from app.images import thumbnail_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail(field, size, ext='jpg'):
+    """{% thumbnail user.profile.profile_image 'sm' 'webp' %}"""
+    return thumbnail_url(field, size, ext)
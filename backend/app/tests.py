@@ -1,3 +1,1317 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import socket
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from PIL import Image as PILImage
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, router, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, include, path, resolve, reverse
+from django.utils import timezone
+
+from .bench import VIEW_CASES, url_names
+from .exports import EXPORTS
+from .forms import ProfileUpdateForm
+from .grids import Grid, ItemGrid, PenaltyGrid
+from .imports import import_items, import_users, open_csv
+from .instrumentation import RequestTimingMiddleware
+from . import counters
+from .models import Profile, Item, BorrowTransaction, Penalty, Counter, DailyRollup, SweepState
+from .rollups import ROLLUP_JOB, _bounds, roll_up, time_series
+from .routing import PIN_COOKIE, REPLICA, ReadReplicaRouter, ReplicaRoutingMiddleware, read_only
+from .search import search_items, search_page
+from . import async_views, images, metrics, services, triggers, urls as app_urls
+from .services import ACTIVE_STATUSES, SweepConflict, sweep_overdue
+from .views import static_asset
+
+# Most queries each view may run. A budget is a constant: it must hold at
+# 10 rows and at 1,000, so a template walking a relation row by row, or an
+# extra .count(), shows up here as a failure listing the SQL.
+QUERY_BUDGETS = {
+    'home': 0,
+    'signup': 0,
+    'signin': 0,
+    'signout': 4,
+    'contact': 0,
+    'about': 0,
+    'user_dashboard': 7,
+    'admin_dashboard': 7,
+    'admin_users': 3,
+    'admin_items': 3,
+    'browse_items': 4,
+    'item_suggestions': 3,
+    'borrow_request': 4,
+    'my_borrows': 7,
+    'manage_borrows': 6,
+    'approve_borrow': 7,
+    'approve_borrows_batch': 14,
+    'return_item': 8,
+    'user_penalties': 7,
+    'user_profile': 3,
+    'admin_penalties': 4,
+    'admin_reports': 3,
+    'admin_export': 3,
+    'analytics_borrows': 3,
+    'analytics_penalties': 3,
+    'update_borrow_status': 6,
+    'cancel_overdue': 8,
+    'metrics': 1,
+}
+
+STATUSES = ['Pending', 'Borrowed', 'Returned', 'Overdue', 'Rejected']
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('budget-admin', password='x', is_staff=True)
+        cls.borrower = User.objects.create_user('budget-user', password='x')
+        Profile.objects.create(user=cls.admin)
+        Profile.objects.create(user=cls.borrower, department='IT')
+
+    def setUp(self):
+        # Cached pages and fragments would otherwise come from an earlier test
+        for alias in ('default', 'fragments'):
+            caches[alias].clear()
+
+    def populate(self, count):
+        """Add ``count`` each of users, items and borrows (half of them the borrower's)."""
+        start = Item.objects.count()
+        today = timezone.localdate()
+        items = Item.objects.bulk_create([
+            Item(name=f'Laptop {start + i}', item_type='Electronics', serial_number=f'QB-{start + i}', stock=50)
+            for i in range(count)
+        ])
+        users = User.objects.bulk_create([User(username=f'qb{start + i}') for i in range(count)])
+        Profile.objects.bulk_create([Profile(user=user, department='CS') for user in users])
+
+        borrows = []
+        for i, item in enumerate(items):
+            status = STATUSES[i % len(STATUSES)]
+            borrow = BorrowTransaction(user=self.borrower if i % 2 == 0 else users[i], item=item, status=status)
+            if status == 'Borrowed':
+                # Not due yet, so the request-time sweep has nothing to do
+                borrow.borrow_date, borrow.due_date = today, today + timedelta(days=3)
+            elif status in ('Returned', 'Overdue'):
+                borrow.borrow_date, borrow.due_date = today - timedelta(days=9), today - timedelta(days=6)
+                borrow.return_date = today - timedelta(days=5 if status == 'Overdue' else 1)
+            borrows.append(borrow)
+        # Enough Pending requests on one item for the batch approval
+        borrows += [BorrowTransaction(user=self.borrower, item=items[0]) for _ in range(12)]
+        borrows = BorrowTransaction.objects.bulk_create(borrows)
+        Penalty.objects.bulk_create([
+            Penalty(borrow_transaction=borrow, amount=Decimal(250),
+                    status='Unpaid' if borrow.status == 'Overdue' else 'Paid')
+            for borrow in borrows if borrow.status in ('Returned', 'Overdue')
+        ])
+
+    def pools(self):
+        def ids(status):
+            return list(BorrowTransaction.objects.filter(status=status).order_by('id').values_list('id', flat=True))
+        return {
+            'pending': ids('Pending'),
+            'borrowed': ids('Borrowed'),
+            'overdue': ids('Overdue'),
+            'item': Item.objects.values_list('id', flat=True).first(),
+        }
+
+    def measure(self, name, pools):
+        role, method, arguments = VIEW_CASES[name]
+        client = Client()
+        if role != 'anon':
+            client.force_login(self.admin if role == 'admin' else self.borrower)
+        kwargs, data = arguments(pools) if arguments else ({}, {})
+        url = reverse(name, kwargs=kwargs)
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, method)(url, data)
+            for _ in getattr(response, 'streaming_content', ()):
+                pass
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url} returned {response.status_code}")
+        return [query['sql'] for query in captured.captured_queries]
+
+    def measure_all(self):
+        pools = self.pools()
+        return {name: self.measure(name, pools) for name in QUERY_BUDGETS}
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(set(url_names()), set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        self.populate(10)
+        small = self.measure_all()
+        self.populate(990)
+        large = self.measure_all()
+
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                queries = large[name]
+                sql = '\n'.join(f'  {n}. {statement}' for n, statement in enumerate(queries, 1))
+                self.assertEqual(
+                    len(queries), len(small[name]),
+                    f"{name} ran {len(small[name])} queries with 10 rows but {len(queries)} with 1,000:\n{sql}",
+                )
+                self.assertLessEqual(len(queries), budget, f"{name} is over its budget of {budget}:\n{sql}")
+
+
+class OverdueSweepTests(TestCase):
+    """The sweep is a fixed set of statements, idempotent, and retried when it loses a race."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sweep-user')
+        cls.item = Item.objects.create(name='Tripod', item_type='Tools', serial_number='SW-1', stock=0)
+
+    def lend(self, count, days_late=2):
+        due = timezone.localdate() - timedelta(days=days_late)
+        BorrowTransaction.objects.bulk_create([
+            BorrowTransaction(user=self.user, item=self.item, status='Borrowed',
+                              borrow_date=due - timedelta(days=3), due_date=due)
+            for _ in range(count)
+        ])
+
+    def sweep_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            sweep_overdue()
+        return len(captured.captured_queries)
+
+    def test_statement_count_does_not_grow_with_active_loans(self):
+        self.lend(2)
+        few = self.sweep_queries()
+        # Below the 199 penalties one INSERT can take on SQLite
+        self.lend(150)
+        self.assertEqual(self.sweep_queries(), few)
+
+    def test_second_sweep_changes_nothing(self):
+        self.lend(3)
+        first = sweep_overdue()
+        self.assertEqual((first.overdue, first.penalties, first.items), (3, 3, 1))
+        second = sweep_overdue()
+        self.assertEqual((second.overdue, second.penalties), (0, 0))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 3)
+        self.assertEqual(Penalty.objects.count(), 3)
+
+    def test_conflicts_and_lock_timeouts_are_retried(self):
+        self.lend(1)
+        real = services._sweep_once
+        failures = [SweepConflict("raced"), OperationalError("database is locked")]
+
+        def flaky(user, today):
+            if failures:
+                raise failures.pop(0)
+            return real(user, today)
+
+        with mock.patch.object(services, '_sweep_once', flaky), mock.patch.object(services, 'SWEEP_BACKOFF', 0):
+            self.assertEqual(sweep_overdue().overdue, 1)
+            # Anything else is not a race and is not retried
+            failures.append(OperationalError("no such table: app_item"))
+            with self.assertRaises(OperationalError):
+                sweep_overdue()
+
+
+class SweepLeaseTests(TestCase):
+    """One worker leads the scheduled sweep; it records a watermark and outlives a failing run."""
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def later(self, seconds):
+        return self.now + timedelta(seconds=seconds)
+
+    def test_lease_has_one_owner_until_it_expires(self):
+        self.assertTrue(services.acquire_sweep_lease('a', 60, self.now))
+        self.assertFalse(services.acquire_sweep_lease('b', 60, self.later(30)))
+        # The owner renews it...
+        self.assertTrue(services.acquire_sweep_lease('a', 60, self.later(30)))
+        self.assertFalse(services.acquire_sweep_lease('b', 60, self.later(89)))
+        # ...and once it lapses anyone may take it over
+        self.assertTrue(services.acquire_sweep_lease('b', 60, self.later(91)))
+        self.assertFalse(services.acquire_sweep_lease('a', 60, self.later(92)))
+
+        services.release_sweep_lease('b')
+        self.assertTrue(services.acquire_sweep_lease('a', 60, self.later(93)))
+
+    def test_scheduled_sweep_records_its_watermark(self):
+        user = User.objects.create_user('watermark')
+        item = Item.objects.create(name='Hoist', item_type='Tools', serial_number='WM-1')
+        BorrowTransaction.objects.create(user=user, item=item, status='Borrowed',
+                                         due_date=self.now.date() - timedelta(days=2))
+
+        self.assertEqual(services.run_scheduled_sweep('a', 60, min_gap=30, now=self.now).overdue, 1)
+        state = SweepState.objects.get(name=services.OVERDUE_SWEEP)
+        self.assertEqual((state.owner, state.last_swept_at, state.last_overdue, state.runs), ('a', self.now, 1, 1))
+
+        # Not due yet, and not the leader: neither sweeps
+        self.assertIsNone(services.run_scheduled_sweep('a', 60, min_gap=30, now=self.later(10)))
+        self.assertIsNone(services.run_scheduled_sweep('b', 60, now=self.later(20)))
+        self.assertEqual(SweepState.objects.get(name=services.OVERDUE_SWEEP).runs, 1)
+
+        self.assertEqual(services.run_scheduled_sweep('a', 60, min_gap=30, now=self.later(31)).overdue, 0)
+        state.refresh_from_db()
+        self.assertEqual((state.last_swept_at, state.runs), (self.later(31), 2))
+
+    def test_worker_survives_a_failing_run(self):
+        command = 'app.management.commands.sweep_overdue'
+        SweepState.objects.create(name=services.OVERDUE_SWEEP, owner=f"{socket.gethostname()}:{os.getpid()}",
+                                  lease_until=self.later(60))
+        runs = mock.Mock(side_effect=[RuntimeError("disk full"), None])
+        with mock.patch(f'{command}.run_scheduled_sweep', runs), \
+                mock.patch(f'{command}.time.sleep', side_effect=[None, KeyboardInterrupt]), \
+                self.assertLogs(command, 'ERROR') as logged:
+            call_command('sweep_overdue', interval=1, stdout=io.StringIO())
+        self.assertEqual(runs.call_count, 2)
+        self.assertIn('disk full', logged.output[0])
+        # The lease is given up when the worker stops, not when a run fails
+        self.assertEqual(SweepState.objects.get(name=services.OVERDUE_SWEEP).owner, '')
+
+
+class StatusRaceTests(TestCase):
+    """Status changes read with a stale status lose, leaving stock and status as the winner left them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('race-admin', password='pw', is_staff=True)
+        cls.user = User.objects.create_user('race-user')
+        cls.item = Item.objects.create(name='Drill', item_type='Tools', serial_number='RC-1', stock=5)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def loan(self, status, quantity=2):
+        return BorrowTransaction.objects.create(user=self.user, item=self.item, status=status,
+                                                quantity=quantity, due_date=timezone.localdate())
+
+    def assertState(self, borrow, status, stock):
+        borrow.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual((borrow.status, self.item.stock), (status, stock))
+
+    def test_stale_status_write_after_approval_is_refused(self):
+        borrow = self.loan('Pending')
+        stale = BorrowTransaction.objects.get(id=borrow.id)
+        self.assertTrue(services.reserve_stock(borrow).ok)
+        # Read as Pending before the approval: rejecting it now would strand the stock
+        self.assertFalse(services.change_status(stale, 'Rejected').ok)
+        self.assertState(borrow, 'Borrowed', 3)
+
+    def test_stale_page_is_refused(self):
+        borrow = self.loan('Pending')
+        services.reserve_stock(borrow)
+        self.client.post(reverse('update_borrow_status', args=[borrow.id]),
+                         {'status': 'Rejected', 'seen_status': 'Pending'})
+        self.assertState(borrow, 'Borrowed', 3)
+
+    def test_leaving_borrowed_puts_stock_back(self):
+        borrow = self.loan('Pending')
+        services.reserve_stock(borrow)
+        self.client.post(reverse('update_borrow_status', args=[borrow.id]),
+                         {'status': 'Rejected', 'seen_status': 'Borrowed'})
+        self.assertState(borrow, 'Rejected', 5)
+
+    def test_cancel_overdue_after_a_return_is_refused(self):
+        borrow = self.loan('Borrowed')
+        services.mark_overdue(borrow)
+        stale = BorrowTransaction.objects.get(id=borrow.id)
+        self.assertTrue(services.return_borrow(borrow).ok)
+        self.assertFalse(services.cancel_overdue(stale).ok)
+        self.assertState(borrow, 'Returned', 7)
+        self.assertEqual(Penalty.objects.get(borrow_transaction=borrow).status, 'Paid')
+
+    def test_cancel_overdue(self):
+        borrow = self.loan('Borrowed')
+        services.mark_overdue(borrow)
+        self.client.post(reverse('cancel_overdue', args=[borrow.id]))
+        self.assertState(borrow, 'Returned', 7)
+        self.assertFalse(Penalty.objects.filter(borrow_transaction=borrow).exists())
+
+
+class BatchApprovalTests(TestCase):
+    """Batch approval hands stock out by request id and gives up cleanly when it keeps losing races."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('batch-admin', is_staff=True)
+        cls.user = User.objects.create_user('batch-user')
+        cls.item = Item.objects.create(name='Ladder', item_type='Tools', serial_number='BA-1', stock=3)
+
+    def request(self, quantity):
+        return BorrowTransaction.objects.create(user=self.user, item=self.item, quantity=quantity)
+
+    def test_first_come_first_served(self):
+        first, second, third = self.request(2), self.request(2), self.request(1)
+        batch = services.approve_pending(item_id=self.item.id)
+        self.assertEqual(batch.results, {first.id: 'approved', second.id: 'stock', third.id: 'approved'})
+        self.assertEqual(
+            dict(BorrowTransaction.objects.values_list('id', 'status')),
+            {first.id: 'Borrowed', second.id: 'Pending', third.id: 'Borrowed'},
+        )
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock, self.item.condition), (0, 'Borrowed'))
+
+    def test_lost_race_is_retried(self):
+        borrow = self.request(1)
+        real = services._take_stock
+        races = [1]
+
+        def racing(item_id, quantity):
+            # Another admin takes the stock between the read and the update, once
+            if races:
+                races.pop()
+                return False
+            return real(item_id, quantity)
+
+        with mock.patch.object(services, '_take_stock', racing):
+            batch = services.approve_pending(borrow_ids=[borrow.id])
+        self.assertEqual((batch.conflicted, batch.results), (False, {borrow.id: 'approved'}))
+
+    def test_losing_every_attempt_approves_nothing(self):
+        borrow = self.request(1)
+        self.client.force_login(self.admin)
+        with mock.patch.object(services, '_take_stock', return_value=False):
+            self.assertTrue(services.approve_pending(borrow_ids=[borrow.id]).conflicted)
+            response = self.client.post(reverse('approve_borrows_batch'), {'borrow_ids': [borrow.id]},
+                                        HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 409)
+        borrow.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual((borrow.status, self.item.stock), ('Pending', 3))
+
+    def test_losing_every_attempt_redirects_the_page(self):
+        borrow = self.request(1)
+        self.client.force_login(self.admin)
+        with mock.patch.object(services, '_take_stock', return_value=False):
+            response = self.client.post(reverse('approve_borrows_batch'), {'borrow_ids': [borrow.id]},
+                                        HTTP_ACCEPT='*/*')
+        self.assertRedirects(response, reverse('manage_borrows'), fetch_redirect_response=False)
+
+    def test_summary_is_json_only_when_preferred(self):
+        self.client.force_login(self.admin)
+        url = reverse('approve_borrows_batch')
+        for accept in ('application/json', 'application/json, text/plain, */*'):
+            with self.subTest(accept=accept):
+                borrow = self.request(1)
+                response = self.client.post(url, {'borrow_ids': [borrow.id]}, HTTP_ACCEPT=accept)
+                self.assertEqual(response.json(), {'approved': 1, 'skipped': 0, 'results': {str(borrow.id): 'approved'}})
+        # Browsers, bare */* and clients that send no Accept at all get the page
+        for accept in ('text/html,application/xhtml+xml,*/*;q=0.8', '*/*', None):
+            with self.subTest(accept=accept):
+                headers = {'HTTP_ACCEPT': accept} if accept else {}
+                response = self.client.post(url, {'borrow_ids': [self.request(1).id]}, **headers)
+                self.assertRedirects(response, reverse('manage_borrows'), fetch_redirect_response=False)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "page versions are kept by SQLite triggers")
+class PageVersionTests(TestCase):
+    """ETags and cached fragments change exactly when the rows they show do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('etag-user')
+        cls.other = User.objects.create_user('etag-other')
+        cls.item = Item.objects.create(name='Projector', item_type='Electronics', serial_number='ET-1', stock=3)
+
+    def setUp(self):
+        for alias in ('default', 'fragments'):
+            caches[alias].clear()
+        self.client.force_login(self.user)
+
+    def etag(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_page_is_not_modified_without_queries(self):
+        etag = self.etag('my_borrows')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('my_borrows'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([q for q in captured.captured_queries if 'app_borrowtransaction' in q['sql']])
+
+    def test_writes_change_the_right_versions(self):
+        catalogue, borrows = self.etag('browse_items'), self.etag('my_borrows')
+
+        BorrowTransaction.objects.create(user=self.other, item=self.item)
+        self.assertEqual(self.etag('my_borrows'), borrows)
+
+        # A stock change (QuerySet.update, no signals) moves the catalogue only
+        Item.objects.filter(id=self.item.id).update(stock=2)
+        self.assertNotEqual(self.etag('browse_items'), catalogue)
+        self.assertEqual(self.etag('my_borrows'), borrows)
+
+        borrow = BorrowTransaction.objects.create(user=self.user, item=self.item)
+        changed = self.etag('my_borrows')
+        self.assertNotEqual(changed, borrows)
+        BorrowTransaction.objects.filter(id=borrow.id).update(status='Rejected')
+        self.assertNotEqual(self.etag('my_borrows'), changed)
+        self.assertContains(self.client.get(reverse('my_borrows')), 'Rejected')
+
+    def test_dashboard_fragments_follow_profile_changes(self):
+        profile = Profile.objects.create(user=self.user, department='Nursing')
+        self.assertContains(self.client.get(reverse('user_dashboard')), 'Nursing')
+        with CaptureQueriesContext(connection) as captured:
+            self.assertContains(self.client.get(reverse('user_dashboard')), 'Nursing')
+        self.assertFalse([q for q in captured.captured_queries if 'app_profile' in q['sql']])
+
+        Profile.objects.filter(id=profile.id).update(department='Business')
+        self.assertContains(self.client.get(reverse('user_dashboard')), 'Business')
+
+    def test_navbar_picks_up_thumbnails_once_written(self):
+        source = io.BytesIO()
+        PILImage.new('RGB', (120, 80), 'teal').save(source, 'PNG')
+        processed = images.process_image(source)
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            Profile.objects.create(user=self.user, profile_image=images.store_image(processed))
+            # Before the worker has written them the navbar shows the original, and is cached that way
+            self.assertContains(self.client.get(reverse('user_dashboard')), processed.name)
+            self.assertNotContains(self.client.get(reverse('user_dashboard')), images.THUMB_DIR)
+
+            images.make_thumbnails(processed)
+            thumbnail = images.thumbnail_name(processed.name, 'sm', 'webp')
+            self.assertContains(self.client.get(reverse('user_dashboard')), thumbnail)
+
+
+def photo(size=(2000, 1500)):
+    """JPEG bytes as a phone writes them: rotated by an EXIF tag, with camera and GPS data."""
+    exif = PILImage.Exif()
+    exif[0x010F] = 'Camera'
+    exif[0x0112] = 6   # stored landscape, shown rotated to portrait
+    exif.get_ifd(0x8825).update({1: 'N', 2: (51.0, 30.0, 0.0)})
+    buffer = io.BytesIO()
+    PILImage.new('RGB', size, 'teal').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class ProfileImageTests(TestCase):
+    """Stored profile pictures are re-encoded without metadata, capped in size and named by content."""
+
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.user = User.objects.create_user('pictured')
+
+    def assertClean(self, data):
+        with PILImage.open(io.BytesIO(data)) as image:
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertEqual(image.size, (768, 1024))
+
+    def test_process_image_drops_exif_and_caps_the_size(self):
+        processed = images.process_image(io.BytesIO(photo()))
+        self.assertClean(processed.data)
+        self.assertRegex(processed.name, r'^profile_images/[0-9a-f]{20}\.jpg$')
+        # The same pixels get the same name
+        self.assertEqual(images.process_image(io.BytesIO(photo())).name, processed.name)
+
+    def test_profile_form_stores_a_clean_hashed_file(self):
+        profile = Profile.objects.create(user=self.user)
+        form = ProfileUpdateForm({}, {'profile_image': SimpleUploadedFile('me.jpg', photo(), 'image/jpeg')},
+                                 instance=profile)
+        self.assertTrue(form.is_valid(), form.errors)
+        with mock.patch.object(images, 'queue_thumbnails') as queued:
+            form.save()
+        profile.refresh_from_db()
+        self.assertRegex(profile.profile_image.name, r'^profile_images/[0-9a-f]{20}\.jpg$')
+        with default_storage.open(profile.profile_image.name) as stored:
+            self.assertClean(stored.read())
+        queued.assert_called_once_with(form.processed_image)
+
+    def test_backfill_removes_the_old_originals(self):
+        old = default_storage.save('profile_images/holiday.jpg', ContentFile(photo()))
+        Profile.objects.create(user=self.user, profile_image=old)
+        Profile.objects.create(user=User.objects.create_user('broken'),
+                               profile_image=default_storage.save('profile_images/broken.jpg', ContentFile(b'no')))
+
+        with mock.patch('app.management.commands.backfill_profile_images.make_thumbnails', return_value=0):
+            call_command('backfill_profile_images', workers=1, stdout=io.StringIO(), stderr=io.StringIO())
+        profile = Profile.objects.get(user=self.user)
+        self.assertNotEqual(profile.profile_image.name, old)
+        self.assertFalse(default_storage.exists(old))
+        with default_storage.open(profile.profile_image.name) as stored:
+            self.assertClean(stored.read())
+        # A file that could not be processed is left where it is
+        self.assertTrue(default_storage.exists('profile_images/broken.jpg'))
+
+
+class PublicPageCacheTests(TestCase):
+    """Anonymous visitors get the public pages from the cache, compressed."""
+
+    def setUp(self):
+        caches['pages'].clear()
+
+    def test_cached_page_follows_accept_encoding(self):
+        first = self.client.get(reverse('about'))
+        self.assertTrue(first.templates)
+        plain = self.client.get(reverse('about'))
+        self.assertFalse(plain.templates)
+        self.assertEqual(plain.content, first.content)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+        packed = self.client.get(reverse('about'), HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(packed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(packed.content), first.content)
+        self.assertIn('Accept-Encoding', packed['Vary'])
+        self.assertIn('public', packed['Cache-Control'])
+
+        # Signed-in users get the view itself
+        self.client.force_login(User.objects.create_user('page-user'))
+        self.assertTrue(self.client.get(reverse('about')).templates)
+
+    def test_cached_form_gets_each_visitor_a_csrf_token(self):
+        User.objects.create_user('page-user', password='secret')
+        tokens = []
+        for _ in range(2):
+            client = Client(enforce_csrf_checks=True)
+            page = client.get(reverse('signin')).content.decode()
+            token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+            response = client.post(reverse('signin'), {
+                'username': 'page-user', 'password': 'secret', 'csrfmiddlewaretoken': token,
+            })
+            self.assertRedirects(response, reverse('user_dashboard'), fetch_redirect_response=False)
+            tokens.append(token)
+        self.assertNotEqual(*tokens)
+
+
+class StaticAssetTests(TestCase):
+    """collectstatic fingerprints and precompresses the stylesheets the pages link."""
+
+    def test_fingerprinted_css_is_served_compressed_and_immutable(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            name = staticfiles_storage.stored_name('css/site.css')
+            self.assertNotEqual(name, 'css/site.css')
+            caches['pages'].clear()
+            self.assertContains(self.client.get(reverse('about')), staticfiles_storage.url('css/site.css'))
+
+            factory = RequestFactory()
+            response = static_asset(factory.get('/', HTTP_ACCEPT_ENCODING='gzip'), name)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response['Cache-Control'])
+            with open(os.path.join(root, name), 'rb') as handle:
+                self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), handle.read())
+
+            response = static_asset(factory.get('/'), 'css/site.css')
+            self.assertNotIn('immutable', response['Cache-Control'])
+
+
+class StreamingTableTests(TestCase):
+    """?all=1 streams every row of the admin tables, a chunk at a time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('stream-admin', is_staff=True)
+        user = User.objects.create_user('stream-user')
+        for n in range(5):
+            item = Item.objects.create(name=f'Streamed {n}', item_type='Tools', serial_number=f'ST-{n}', stock=1)
+            BorrowTransaction.objects.create(user=user, item=item, status='Returned')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_streamed_rows_match_the_paginated_table(self):
+        paginated = self.client.get(reverse('manage_borrows')).content.decode()
+        with mock.patch('app.streaming.CHUNK_ROWS', 2):
+            response = self.client.get(reverse('manage_borrows'), {'all': '1'})
+            self.assertTrue(response.streaming)
+            streamed = b''.join(response.streaming_content).decode()
+        names = re.compile(r'<td>(Streamed \d)</td>')
+        self.assertEqual(names.findall(streamed), names.findall(paginated))
+        self.assertEqual(len(names.findall(streamed)), 5)
+        self.assertTrue(streamed.rstrip().endswith('</html>'))
+
+        response = self.client.get(reverse('manage_borrows'), {'all': '1', 'user': 'nobody'})
+        self.assertIn('No Borrow Requests Found', b''.join(response.streaming_content).decode())
+
+
+class KeysetGridTests(TestCase):
+    """Cursor pages cover every row once, in order, whatever the ties and inserts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Three stock values for nine items: the sort key is mostly ties
+        Item.objects.bulk_create([
+            Item(name=f'Item {n}', item_type='Tools', serial_number=f'KG-{n}', stock=n % 3) for n in range(9)
+        ])
+
+    def page(self, grid=ItemGrid, **params):
+        return grid(RequestFactory().get('/', params), page_size=2).page()
+
+    def walk(self, **params):
+        pages, cursor = [], None
+        while True:
+            page = self.page(**params, **({'cursor': cursor} if cursor else {}))
+            pages.append((cursor, [item.id for item in page.rows]))
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_cover_ties_in_order(self):
+        for sort, order in (('stock', ('stock', 'id')), ('-stock', ('-stock', '-id'))):
+            with self.subTest(sort=sort):
+                seen = [pk for _, ids in self.walk(sort=sort) for pk in ids]
+                self.assertEqual(seen, list(Item.objects.order_by(*order).values_list('id', flat=True)))
+
+    def test_cursor_round_trip(self):
+        # Going back to a cursor (the browser's Back button) shows the same page again
+        for cursor, ids in self.walk(sort='stock'):
+            self.assertEqual([item.id for item in self.page(sort='stock', cursor=cursor or '').rows], ids)
+
+    def test_inserts_do_not_shift_later_pages(self):
+        first = self.page(sort='-stock')
+        seen = {item.id for item in first.rows}
+        # New rows on both sides of the cursor: only the one after it shows up
+        early = Item.objects.create(name='Early', item_type='Tools', serial_number='KG-early', stock=9)
+        late = Item.objects.create(name='Late', item_type='Tools', serial_number='KG-late', stock=0)
+        rest, cursor = [], first.next_cursor
+        while cursor:
+            page = self.page(sort='-stock', cursor=cursor)
+            rest += [item.id for item in page.rows]
+            cursor = page.next_cursor
+        self.assertFalse(seen & set(rest))
+        self.assertNotIn(early.id, rest)
+        self.assertIn(late.id, rest)
+        self.assertEqual(len(seen) + len(rest), 10)
+
+    def test_undecodable_cursor_is_the_first_page(self):
+        first = [penalty.id for penalty in self.page(PenaltyGrid).rows]
+        for cursor in ('not base64!', Grid._encode('yesterday', 1), Grid._encode(['x'], 1)):
+            with self.subTest(cursor=cursor):
+                page = self.page(PenaltyGrid, sort='-created', cursor=cursor)
+                self.assertEqual(([penalty.id for penalty in page.rows], page.cursor), (first, None))
+        self.assertEqual(self.page(sort='stock', cursor=Grid._encode('many', 1)).cursor, None)
+
+    def test_base_grid_needs_a_queryset(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.page(Grid)
+
+
+class ImportTests(TestCase):
+    """CSV imports validate per batch, report every bad row and never answer a bad file with a 500."""
+
+    HEADER = 'name,item_type,serial_number,condition,stock\n'
+
+    def load(self, text, **options):
+        data = text.encode() if isinstance(text, str) else text
+        return import_items(open_csv(io.BytesIO(data)), batch_size=2, **options)
+
+    def test_bad_rows_are_reported_and_good_ones_kept(self):
+        report = self.load(self.HEADER + (
+            'Drill,Tools,IM-1,,4\n'
+            ',Tools,IM-2,,1\n'
+            'Saw,Tools,IM-3,Broken,1\n'
+            'Tape,Tools,IM-4,Available,many\n'
+            'Vice,Tools,IM-5,Lost,0\n'
+        ))
+        self.assertEqual((report.rows, report.created, report.error_count), (5, 2, 3))
+        self.assertEqual([(line, serial) for line, serial, _ in report.errors], [(3, 'IM-2'), (4, 'IM-3'), (5, 'IM-4')])
+        self.assertEqual(sorted(Item.objects.values_list('serial_number', flat=True)), ['IM-1', 'IM-5'])
+
+    def test_duplicates_in_file_and_database(self):
+        Item.objects.create(name='Old', item_type='Tools', serial_number='IM-1')
+        report = self.load(self.HEADER + 'Drill,Tools,IM-1,,1\nSaw,Tools,IM-2,,1\nSaw again,Tools,IM-2,,1\n')
+        self.assertEqual(report.errors, [
+            (2, 'IM-1', "serial number already exists"),
+            (4, 'IM-2', "duplicate serial number in file"),
+        ])
+        self.assertEqual(Item.objects.get(serial_number='IM-1').name, 'Old')
+
+    def test_upsert_updates_existing_serial_numbers(self):
+        Item.objects.create(name='Old', item_type='Tools', serial_number='IM-1', stock=1)
+        report = self.load(self.HEADER + 'Drill,Power Tools,IM-1,Lost,7\nSaw,Tools,IM-2,,1\n', upsert=True)
+        self.assertEqual((report.created, report.updated, report.error_count), (1, 1, 0))
+        item = Item.objects.get(serial_number='IM-1')
+        self.assertEqual((item.name, item.item_type, item.condition, item.stock), ('Drill', 'Power Tools', 'Lost', 7))
+
+    def test_unreadable_files_are_file_errors(self):
+        latin1 = (self.HEADER + 'Drill,Tools,IM-1,,1\nSäge,Tools,IM-2,,1\n').encode('latin-1')
+        huge = self.HEADER + 'Drill,Tools,IM-1,,1\n' + 'x' * (csv.field_size_limit() + 1) + ',Tools,IM-2,,1\n'
+        for data, message in ((latin1, "file is not UTF-8 text"), (huge, "malformed CSV")):
+            with self.subTest(message=message):
+                report = self.load(data)
+                self.assertTrue(report.errors[-1][2].startswith(message))
+        # A header that does not decode stops the user import before any hashing
+        report = import_users(open_csv(io.BytesIO('user\xe9name\n'.encode('latin-1'))))
+        self.assertEqual((report.rows, report.errors[0][2]), (0, "file is not UTF-8 text"))
+
+    def test_user_import(self):
+        User.objects.create_user('taken')
+        data = (
+            'username,email,password,department,id_number\n'
+            'alice,alice@example.com,s3cret-pass,Physics,ID-1\n'
+            'bob,,,Chemistry,ID-2\n'
+            'taken,,pass,,\n'
+            'alice,,other-pass,,\n'
+            'not valid!,,pass,,\n'
+            'carol,,carol-pass,,\n'
+        ).encode()
+        report = import_users(open_csv(io.BytesIO(data)), workers=2, batch_size=2)
+        self.assertEqual((report.rows, report.created, report.error_count), (6, 3, 3))
+        self.assertEqual([(line, username) for line, username, _ in report.errors],
+                         [(4, 'taken'), (5, 'alice'), (6, 'not valid!')])
+        self.assertEqual(report.errors[0][2], "username already exists")
+        self.assertEqual(report.errors[1][2], "duplicate username in file")
+
+        users = {user.username: user for user in User.objects.select_related('profile')}
+        self.assertEqual(sorted(users), ['alice', 'bob', 'carol', 'taken'])
+        self.assertTrue(users['alice'].check_password('s3cret-pass'))
+        self.assertTrue(users['carol'].check_password('carol-pass'))
+        self.assertIs(users['bob'].has_usable_password(), False)
+        self.assertEqual((users['alice'].email, users['alice'].profile.department, users['alice'].profile.id_number),
+                         ('alice@example.com', 'Physics', 'ID-1'))
+        self.assertEqual(Profile.objects.filter(user__username__in=['alice', 'bob', 'carol']).count(), 3)
+
+    def test_admin_upload_of_a_binary_file(self):
+        self.client.force_login(User.objects.create_user('import-admin', is_staff=True))
+        upload = SimpleUploadedFile('items.csv', b'\x89PNG\r\n\x1a\n\xff\xfe')
+        response = self.client.post(reverse('admin_items'), {'import_items': '1', 'csv_file': upload})
+        self.assertContains(response, "file is not UTF-8 text")
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "the triggers are SQLite only")
+class TriggerMigrationTests(TransactionTestCase):
+    """Unapplying a migration takes the triggers writing into its table with it, and they stay gone."""
+
+    def tearDown(self):
+        call_command('migrate', 'app', verbosity=0)
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return {name for name, in cursor.fetchall()}
+
+    def test_unapplying_page_versions(self):
+        # migrate runs the post_migrate hook, which must not put them back
+        call_command('migrate', 'app', '0014', verbosity=0)
+        self.assertNotIn('app_version', connection.introspection.table_names())
+        self.assertFalse(self.triggers() & (set(triggers.VERSION_TRIGGERS) | set(triggers.FRAGMENT_TRIGGERS)))
+        # Every table those triggers watched can still be written to
+        user = User.objects.create_user('rolled-back')
+        Profile.objects.create(user=user, department='Nursing')
+        user.save()
+        item = Item.objects.create(name='Rolled back', item_type='Tools', serial_number='TM-1', stock=1)
+        borrow = BorrowTransaction.objects.create(user=user, item=item)
+        Penalty.objects.create(borrow_transaction=borrow, amount=Decimal('50.00'))
+        item.delete()
+
+        call_command('migrate', 'app', verbosity=0)
+        self.assertLessEqual(set(triggers.VERSION_TRIGGERS) | set(triggers.FRAGMENT_TRIGGERS), self.triggers())
+
+    def test_unapplying_counters_and_search(self):
+        call_command('migrate', 'app', '0010', verbosity=0)
+        self.assertFalse({'app_counter', 'app_item_fts'} & set(connection.introspection.table_names()))
+        self.assertEqual(self.triggers(), set())
+        # (BorrowTransaction has columns 0010 does not; users and items are enough here)
+        User.objects.create_user('rolled-back').delete()
+        Item.objects.create(name='Rolled back', item_type='Tools', serial_number='TM-2', stock=1).delete()
+
+        call_command('migrate', 'app', verbosity=0)
+        self.assertEqual(counters.drift(), [])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "counters are kept by SQLite triggers")
+class CounterTests(TestCase):
+    """Every write path keeps the stored counters equal to a recount."""
+
+    def assertCounted(self, **expected):
+        stored, actual = counters.read(), counters.recount()
+        self.assertEqual(counters.drift(), [])
+        for name, count in expected.items():
+            self.assertEqual((stored.count(name), actual.count(name)), (count, count), name)
+
+    def test_writes_keep_counters_exact(self):
+        user = User.objects.create_user('counted')
+        item = Item.objects.create(name='Saw', item_type='Tools', serial_number='CT-1', stock=3)
+        borrow = BorrowTransaction.objects.create(user=user, item=item)
+        self.assertCounted(users=1, items=1, borrows=1, **{'borrows:Pending': 1})
+
+        borrow.status = 'Borrowed'
+        borrow.save()
+        BorrowTransaction.objects.filter(id=borrow.id).update(status='Overdue')
+        Penalty.objects.create(borrow_transaction=borrow, amount=Decimal('150.00'))
+        Penalty.objects.filter(borrow_transaction=borrow).update(status='Paid')
+        self.assertCounted(**{'borrows:Pending': 0, 'borrows:Overdue': 1, 'penalties:Paid': 1})
+        self.assertEqual(counters.read().amount('penalties:Paid'), Decimal('150.00'))
+
+        BorrowTransaction.objects.bulk_create([BorrowTransaction(user=user, item=item) for _ in range(4)])
+        self.assertCounted(borrows=5, **{'borrows:Pending': 4})
+
+        # Deleting the item cascades to its borrows and their penalty
+        item.delete()
+        self.assertCounted(items=0, borrows=0, penalties=0, **{'borrows:Overdue': 0})
+        user.delete()
+        self.assertCounted(users=0)
+
+    def test_check_reports_drift(self):
+        Item.objects.create(name='Level', item_type='Tools', serial_number='CT-2')
+        call_command('rebuild_counters', '--check', stdout=io.StringIO())
+        Counter.objects.filter(name='items').update(count=5)
+
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=out)
+        self.assertIn('items: stored 5', out.getvalue())
+
+        call_command('rebuild_counters', stdout=io.StringIO())
+        self.assertCounted(items=1)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "the FTS5 index is SQLite only")
+class SearchIndexTests(TestCase):
+    """app_item_fts follows app_item through its triggers; results are ranked and paged by offset."""
+
+    def found(self, text):
+        return [item.id for item in search_items(text, in_stock=False)]
+
+    def test_index_follows_insert_rename_and_delete(self):
+        item = Item.objects.create(name='Cordless Drill', item_type='Tools', serial_number='FTS-1', stock=1)
+        self.assertEqual(self.found('cord'), [item.id])
+        self.assertEqual(self.found('fts'), [item.id])
+
+        item.name = 'Claw Hammer'
+        item.save()
+        self.assertEqual(self.found('cord'), [])
+        self.assertEqual(self.found('claw hamm'), [item.id])
+        # Stock is not indexed, but an update must not lose the row
+        Item.objects.filter(id=item.id).update(stock=0)
+        self.assertEqual(self.found('hammer'), [item.id])
+        self.assertEqual(search_items('hammer'), [])
+
+        item.delete()
+        self.assertEqual(self.found('hammer'), [])
+
+    def test_best_match_first(self):
+        Item.objects.create(name='Drill bit set for masonry and wood', item_type='Tools', serial_number='FTS-2')
+        best = Item.objects.create(name='Drill', item_type='Tools', serial_number='FTS-3')
+        self.assertEqual(self.found('drill')[0], best.id)
+
+    def test_cursor_pages_through_every_match(self):
+        made = {Item.objects.create(name=f'Lamp {n}', item_type='Lighting', serial_number=f'FTS-L{n}', stock=1).id
+                for n in range(5)}
+        Item.objects.create(name='Lamp shade', item_type='Lighting', serial_number='FTS-L9', stock=0)
+        seen, cursor = [], ''
+        while cursor is not None:
+            page = search_page(RequestFactory().get('/', {'q': 'lamp', 'cursor': cursor}), page_size=2)
+            seen += [item.id for item in page.rows]
+            cursor = page.next_cursor
+        # Out of stock items are left out of the catalogue
+        self.assertEqual((len(seen), set(seen)), (5, made))
+
+
+@override_settings(DATABASE_ROUTERS=['app.routing.ReadReplicaRouter'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """@read_only views read from the replica until the client or the request itself writes."""
+
+    def setUp(self):
+        self.reads = []
+        replica = mock.patch.dict(settings.DATABASES, {REPLICA: settings.DATABASES['default']})
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def serve(self, method='get', cookies=None, writes=False, view_read_only=True):
+        def view(request):
+            self.reads.append(router.db_for_read(Item))
+            if writes:
+                Item.objects.create(name='Routed', item_type='Tools', serial_number=f'RR-{len(self.reads)}')
+                self.reads.append(router.db_for_read(Item))
+            with transaction.atomic():
+                self.reads.append(router.db_for_read(Item))
+            return HttpResponse()
+
+        if view_read_only:
+            read_only(view)
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = ResolverMatch(view, (), {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_read_only_views_read_from_the_replica(self):
+        self.serve()
+        self.serve(view_read_only=False)
+        # Inside a transaction the primary is read, and so is everything outside a request
+        self.assertEqual(self.reads, [REPLICA, 'default', 'default', 'default'])
+        self.assertEqual(router.db_for_read(Item), 'default')
+
+    def test_a_write_pins_the_client_to_the_primary(self):
+        response = self.serve('post', writes=True)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+        # The request's own reads after its write already go to the primary
+        self.assertEqual(self.reads, [REPLICA, 'default', 'default'])
+
+        self.reads.clear()
+        self.serve(cookies={PIN_COOKIE: response.cookies[PIN_COOKIE].value})
+        self.assertEqual(self.reads, ['default', 'default'])
+
+    def test_only_writing_posts_pin(self):
+        self.assertNotIn(PIN_COOKIE, self.serve('post').cookies)
+        # A GET that writes (the overdue sweep) changes nothing this client must see
+        self.assertNotIn(PIN_COOKIE, self.serve(writes=True).cookies)
+
+    def test_only_the_primary_is_migrated(self):
+        self.assertTrue(ReadReplicaRouter().allow_migrate('default', 'app'))
+        self.assertFalse(ReadReplicaRouter().allow_migrate(REPLICA, 'app'))
+
+    def test_middleware_is_dropped_without_a_replica(self):
+        del settings.DATABASES[REPLICA]
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+
+ASYNC_PAGES = ('user_dashboard', 'admin_dashboard', 'browse_items', 'my_borrows', 'user_penalties')
+
+
+class AsyncURLConf:
+    """The project's URLs with the pages of app/async_views.py, whatever ASYNC_VIEWS says."""
+    pages = [path(str(pattern.pattern), getattr(async_views, pattern.name) if pattern.name in ASYNC_PAGES
+                  else pattern.callback, name=pattern.name)
+             for pattern in app_urls.urlpatterns]
+    urlpatterns = [path('admin/', admin.site.urls), path('', include(pages)), path('accounts/', include(pages))]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewTests(TestCase):
+    """Each async page served through AsyncClient."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async-user')
+        cls.admin = User.objects.create_user('async-admin', is_staff=True)
+        cls.item = Item.objects.create(name='Async Kettle', item_type='Kitchen', serial_number='AV-1', stock=2)
+        borrow = BorrowTransaction.objects.create(user=cls.user, item=cls.item, status='Returned')
+        Penalty.objects.create(borrow_transaction=borrow, amount=Decimal('50.00'), status='Paid')
+
+    async def get(self, name, user=None, **params):
+        self.assertTrue(iscoroutinefunction(resolve(reverse(name)).func), name)
+        await self.async_client.aforce_login(user or self.user)
+        return await self.async_client.get(reverse(name), params)
+
+    async def test_pages_need_a_signed_in_user(self):
+        for name in ASYNC_PAGES:
+            with self.subTest(name=name):
+                response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 302)
+                self.assertIn(settings.LOGIN_URL, response['Location'])
+
+    async def test_user_dashboard(self):
+        self.assertEqual((await self.get('user_dashboard')).status_code, 200)
+
+    async def test_admin_dashboard(self):
+        self.assertEqual((await self.get('admin_dashboard', self.admin)).status_code, 200)
+
+    async def test_browse_items(self):
+        self.assertContains(await self.get('browse_items'), 'Async Kettle')
+        self.assertContains(await self.get('browse_items', q='kettle'), 'Async Kettle')
+
+    async def test_my_borrows(self):
+        self.assertContains(await self.get('my_borrows'), 'Async Kettle')
+
+    async def test_user_penalties(self):
+        response = await self.get('user_penalties')
+        self.assertEqual((response.context['paid_count'], response.context['unpaid_count']), (1, 0))
+
+
+class ExportTests(TestCase):
+    """Exports stream every filtered row as CSV or NDJSON, optionally gzipped."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('export-admin', is_staff=True)
+        user = User.objects.create_user('exporter')
+        item = Item.objects.create(name='Drill, "heavy"\nduty', item_type='Tools', serial_number='EX-1')
+        cls.returned = BorrowTransaction.objects.create(user=user, item=item, status='Returned',
+                                                        borrow_date=date(2026, 3, 2))
+        cls.pending = BorrowTransaction.objects.create(user=user, item=item, borrow_date=date(2026, 4, 1))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, dataset='borrows', **params):
+        response = self.client.get(reverse('admin_export', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export().decode())))
+        header = [name for name, _ in EXPORTS['borrows'][1]]
+        self.assertEqual(rows[0], header)
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.returned.id), str(self.pending.id)])
+        # Commas, quotes and newlines survive the quoting
+        self.assertEqual(rows[1][header.index('item')], 'Drill, "heavy"\nduty')
+
+    def test_ndjson_is_one_object_per_line(self):
+        lines = self.export(format='ndjson').decode().splitlines()
+        objects = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in objects], [self.returned.id, self.pending.id])
+        self.assertEqual(objects[0]['item'], 'Drill, "heavy"\nduty')
+        self.assertEqual(objects[0]['borrow_date'], '2026-03-02')
+
+    def test_filters_apply(self):
+        def ids(**params):
+            return [row['id'] for row in map(json.loads, self.export(format='ndjson', **params).splitlines())]
+
+        self.assertEqual(ids(status='Returned'), [self.returned.id])
+        self.assertEqual(ids(**{'from': '2026-03-15'}), [self.pending.id])
+        self.assertEqual(ids(**{'from': '2026-03-01', 'to': '2026-03-31'}), [self.returned.id])
+
+    def test_gzip_holds_the_same_rows(self):
+        for fmt in ('csv', 'ndjson'):
+            with self.subTest(format=fmt):
+                self.assertEqual(gzip.decompress(self.export(format=fmt, gzip=1)), self.export(format=fmt))
+
+    def test_unknown_format_or_dataset(self):
+        self.assertEqual(self.client.get(reverse('admin_export', args=['borrows']), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('admin_export', args=['secrets'])).status_code, 400)
+
+
+class MetricsTests(TestCase):
+    """The /metrics exposition, its per-process merge and its bearer token."""
+
+    def setUp(self):
+        self.enterContext(mock.patch.dict(metrics._samples, clear=True))
+
+    def test_exposition_format(self):
+        metrics.observe('borrowlink_http_request_duration_seconds', 0.03, view='home')
+        metrics.observe('borrowlink_http_request_duration_seconds', 0.3, view='home')
+        lines = metrics.render().splitlines()
+        for name, (kind, help_text) in metrics.FAMILIES.items():
+            self.assertIn(f'# HELP {name} {help_text}', lines)
+            self.assertIn(f'# TYPE {name} {kind}', lines)
+
+        buckets = [re.fullmatch(r'borrowlink_http_request_duration_seconds_bucket\{view="home",le="([^"]+)"\} (\d+)', line)
+                   for line in lines]
+        buckets = [(match[1], int(match[2])) for match in buckets if match]
+        self.assertEqual([bound for bound, _ in buckets], [str(bound) for bound in metrics.BUCKETS] + ['+Inf'])
+        counts = [count for _, count in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(dict(buckets)['0.025'], 0)
+        self.assertEqual(dict(buckets)['0.05'], 1)
+        self.assertEqual(dict(buckets)['+Inf'], 2)
+        self.assertIn('borrowlink_http_request_duration_seconds_count{view="home"} 2', lines)
+
+    def test_inc_on_commit_waits_for_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            metrics.inc_on_commit('borrowlink_returns_total')
+            self.assertNotIn('borrowlink_returns_total', metrics._samples)
+        self.assertEqual(metrics._samples['borrowlink_returns_total'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                metrics.inc_on_commit('borrowlink_returns_total')
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(metrics._samples['borrowlink_returns_total'], 1)
+
+    def test_metrics_dir_sums_every_process(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        with open(os.path.join(directory, 'other-process.json'), 'w') as handle:
+            json.dump({'borrowlink_returns_total': 2, 'borrowlink_approvals_total': 1}, handle)
+        with open(os.path.join(directory, 'half-written.json'), 'w') as handle:
+            handle.write('{"borrowlink_returns_total": ')
+        metrics.inc('borrowlink_returns_total')
+
+        with override_settings(METRICS_DIR=directory):
+            merged = metrics.collect()
+        self.assertEqual(merged['borrowlink_returns_total'], 3)
+        self.assertEqual(merged['borrowlink_approvals_total'], 1)
+        self.assertTrue(os.path.exists(os.path.join(directory, f'{metrics._token}.json')))
+
+    def test_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(url).status_code, 401)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class RequestTimingTests(TestCase):
+    """Server-Timing and the slow-query log, only with REQUEST_TIMING on."""
+
+    def get(self, name):
+        # A fresh client builds its middleware chain under the current settings
+        return Client().get(reverse(name))
+
+    def test_off_by_default(self):
+        with override_settings(REQUEST_TIMING=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                RequestTimingMiddleware(lambda request: HttpResponse())
+            self.assertNotIn('Server-Timing', self.get('metrics'))
+
+    @override_settings(REQUEST_TIMING=True)
+    def test_server_timing_header(self):
+        timing = self.get('metrics')['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="[1-9]\d* queries", template;dur=[\d.]+, '
+                                 r'view;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('template;dur=', self.get('about')['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING=True, SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_the_view(self):
+        with self.assertLogs('app.sql', 'WARNING') as logs:
+            self.get('metrics')
+        self.assertIn('slow query', logs.output[0])
+        self.assertIn(' in app.views.metrics_view at ', logs.output[0])
+
+    @override_settings(REQUEST_TIMING=True)
+    def test_fast_queries_are_not_logged(self):
+        with self.assertNoLogs('app.sql'):
+            self.get('metrics')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "the production profile is for SQLite")
+class ProductionDatabaseTests(TestCase):
+    """A connection opened under DATABASE_PROFILE=production gets WAL, its pragmas and BEGIN IMMEDIATE."""
+
+    def setUp(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'production.sqlite3')
+        self.connections = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, **settings.SQLITE_PRODUCTION},
+        })
+        self.addCleanup(self.connections.close_all)
+        self.connection = self.connections['default']
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_transactions_begin_immediate(self):
+        with mock.patch.object(transaction, 'connections', self.connections), \
+                CaptureQueriesContext(self.connection) as queries, transaction.atomic():
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        self.assertEqual(self.connection.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class RollupTests(TestCase):
+    """Closed days are rolled up once each and summed into day, week and month series."""
+
+    # Monday and Friday of one week in February, then Monday of the next (in March)
+    DAYS = (date(2026, 2, 23), date(2026, 2, 27), date(2026, 3, 2))
+    TODAY = date(2026, 3, 4)
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('rollup-user')
+        drill = Item.objects.create(name='Drill', item_type='Tools', serial_number='RU-1')
+        kettle = Item.objects.create(name='Kettle', item_type='Kitchen', serial_number='RU-2')
+        for day, item in zip(cls.DAYS, (drill, kettle, drill)):
+            noon = timezone.make_aware(datetime.combine(day, time(12)))
+            BorrowTransaction.objects.create(user=user, item=item, requested_at=noon, borrow_date=day)
+        cls.admin = User.objects.create_user('rollup-admin', is_staff=True)
+
+    def series(self, bucket, **options):
+        return [(row['period'], row['requested']) for row in time_series(['requested'], bucket, **options)]
+
+    def test_each_closed_day_is_rolled_up_once(self):
+        # 23 February to 3 March: today is still open
+        self.assertEqual(roll_up(self.TODAY), 9)
+        self.assertEqual(roll_up(self.TODAY), 0)
+        state = SweepState.objects.get(name=ROLLUP_JOB)
+        self.assertEqual(state.last_swept_at, _bounds(date(2026, 3, 3), date(2026, 3, 3))[0])
+        self.assertEqual(roll_up(self.TODAY + timedelta(days=1)), 1)
+        state.refresh_from_db()
+        self.assertEqual(state.last_swept_at, _bounds(self.TODAY, self.TODAY)[0])
+
+    def test_rebuild_recomputes_the_totals(self):
+        roll_up(self.TODAY)
+        DailyRollup.objects.update(requested=99)
+        self.assertEqual(roll_up(self.TODAY, rebuild=True), 9)
+        self.assertEqual(sum(row.requested for row in DailyRollup.objects.all()), 3)
+
+    def test_buckets_sum_their_days(self):
+        roll_up(self.TODAY)
+        self.assertEqual(self.series('day'), [(day, 1) for day in self.DAYS])
+        self.assertEqual(self.series('week'), [(date(2026, 2, 23), 2), (date(2026, 3, 2), 1)])
+        self.assertEqual(self.series('month'), [(date(2026, 2, 1), 2), (date(2026, 3, 1), 1)])
+        self.assertEqual(self.series('month', first_day=date(2026, 2, 24)), [(date(2026, 2, 1), 1), (date(2026, 3, 1), 1)])
+
+    def test_series_split_by_item_type(self):
+        roll_up(self.TODAY)
+        rows = time_series(['requested', 'approved'], 'week', by_item_type=True)
+        self.assertEqual([(row['period'], row['item_type'], row['requested'], row['approved']) for row in rows], [
+            (date(2026, 2, 23), 'Kitchen', 1, 1),
+            (date(2026, 2, 23), 'Tools', 1, 1),
+            (date(2026, 3, 2), 'Tools', 1, 1),
+        ])
+        self.assertEqual(self.series('week', item_type='Kitchen'), [(date(2026, 2, 23), 1)])
+
+    def test_analytics_rejects_bad_parameters(self):
+        roll_up(self.TODAY)
+        self.client.force_login(self.admin)
+        url = reverse('analytics_borrows')
+        response = self.client.get(url, {'bucket': 'week', 'from': '2026-02-01', 'to': '2026-02-28'})
+        self.assertEqual(response.json()['series'], [{'period': '2026-02-23', 'requested': 2, 'approved': 2,
+                                                      'returned': 0, 'overdue': 0}])
+        for params in ({'bucket': 'year'}, {'from': 'yesterday'}, {'to': '2026-13-45'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite syntax")
+class IndexPlanTests(TestCase):
+    """The hot queries must be answered from an index, never a full table scan."""
+    FULL_SCAN = re.compile(r'^SCAN (app_borrowtransaction|app_penalty)$')
+
+    def key_queries(self):
+        user = User.objects.create_user('plan-user')
+        today = timezone.localdate()
+        start, end = _bounds(today - timedelta(days=30), today)
+        borrows = BorrowTransaction.objects
+        return {
+            'overdue sweep': borrows.filter(status__in=ACTIVE_STATUSES, due_date__lt=today)
+                .values_list('id', 'item_id', 'quantity', 'due_date', 'penalty__id'),
+            'per-user sweep': borrows.filter(user=user, status__in=ACTIVE_STATUSES, due_date__lt=today),
+            'my borrows': borrows.filter(user=user).select_related('item'),
+            'my active borrows': borrows.filter(user=user, status='Borrowed'),
+            'pending for item': borrows.filter(status='Pending', item_id=1).order_by('id'),
+            'borrows by status': borrows.filter(status='Pending').order_by('-id')[:51],
+            'requested per day': borrows.filter(requested_at__gte=start, requested_at__lt=end),
+            'approved per day': borrows.filter(borrow_date__range=(today - timedelta(days=30), today)),
+            'returned per day': borrows.filter(status='Returned', return_date__range=(today, today)),
+            'penalties by status': Penalty.objects.filter(status='Unpaid').order_by('-created_at')[:51],
+            'newest penalties': Penalty.objects.order_by('-created_at')[:51],
+            'user penalties': Penalty.objects.filter(borrow_transaction__user=user)
+                .select_related('borrow_transaction__item').order_by('-created_at'),
+            'penalties issued per day': Penalty.objects.filter(created_at__gte=start, created_at__lt=end),
+            'penalties paid per day': Penalty.objects.filter(status='Paid', paid_at__gte=start, paid_at__lt=end),
+        }
+
+    def test_key_queries_use_indexes(self):
+        for label, queryset in self.key_queries().items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            with self.subTest(query=label):
+                scans = [step for step in plan if self.FULL_SCAN.match(step)]
+                self.assertFalse(scans, f"{label} scans a whole table:\n  " + '\n  '.join(plan) + f"\n{sql}")
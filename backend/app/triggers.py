@@ -0,0 +1,211 @@
+import re
+
+from django.db import connections
+
+
+def _bump(name, count, amount='0'):
+    return (
+        f"INSERT INTO app_counter(name, count, amount) VALUES ({name}, {count}, {amount}) "
+        f"ON CONFLICT(name) DO UPDATE SET count = count + excluded.count, "
+        f"amount = ROUND(amount + excluded.amount, 2);"
+    )
+
+
+def _touch(name, when='1'):
+    # INSERT ... SELECT so the bump can be conditional; the WHERE also keeps
+    # SQLite from reading ON CONFLICT as part of the SELECT
+    return (
+        f"INSERT INTO app_version(name, value) SELECT {name}, 1 WHERE {when} "
+        f"ON CONFLICT(name) DO UPDATE SET value = value + 1;"
+    )
+
+
+# --------- SQLite Triggers ---------
+# SQLite drops a table's triggers whenever a migration rebuilds that table
+# (most AlterField operations do), so they are (re)created after every
+# migrate rather than once in a migration.
+
+# Keep app_item_fts (migration 0011) in sync with app_item; stock-only
+# updates don't touch the indexed columns and skip the reindex.
+FTS_TRIGGERS = {
+    'app_item_fts_ai': (
+        "AFTER INSERT ON app_item",
+        "INSERT INTO app_item_fts(rowid, name, item_type, serial_number) "
+        "VALUES (new.id, new.name, new.item_type, new.serial_number);",
+    ),
+    'app_item_fts_ad': (
+        "AFTER DELETE ON app_item",
+        "INSERT INTO app_item_fts(app_item_fts, rowid, name, item_type, serial_number) "
+        "VALUES ('delete', old.id, old.name, old.item_type, old.serial_number);",
+    ),
+    'app_item_fts_au': (
+        "AFTER UPDATE OF name, item_type, serial_number ON app_item",
+        "INSERT INTO app_item_fts(app_item_fts, rowid, name, item_type, serial_number) "
+        "VALUES ('delete', old.id, old.name, old.item_type, old.serial_number); "
+        "INSERT INTO app_item_fts(rowid, name, item_type, serial_number) "
+        "VALUES (new.id, new.name, new.item_type, new.serial_number);",
+    ),
+}
+
+# Every write to a counted table adjusts app_counter in the same
+# transaction, including cascades, bulk_create and QuerySet.update().
+COUNTER_TRIGGERS = {
+    'app_counter_user_ai': (
+        "AFTER INSERT ON auth_user",
+        _bump("'users'", "1 - new.is_staff") + _bump("'accounts'", "1 - new.is_superuser"),
+    ),
+    'app_counter_user_ad': (
+        "AFTER DELETE ON auth_user",
+        _bump("'users'", "old.is_staff - 1") + _bump("'accounts'", "old.is_superuser - 1"),
+    ),
+    'app_counter_user_au': (
+        "AFTER UPDATE OF is_staff, is_superuser ON auth_user",
+        _bump("'users'", "old.is_staff - new.is_staff") + _bump("'accounts'", "old.is_superuser - new.is_superuser"),
+    ),
+    'app_counter_item_ai': ("AFTER INSERT ON app_item", _bump("'items'", "1")),
+    'app_counter_item_ad': ("AFTER DELETE ON app_item", _bump("'items'", "-1")),
+    'app_counter_borrow_ai': (
+        "AFTER INSERT ON app_borrowtransaction",
+        _bump("'borrows'", "1") + _bump("'borrows:' || new.status", "1"),
+    ),
+    'app_counter_borrow_ad': (
+        "AFTER DELETE ON app_borrowtransaction",
+        _bump("'borrows'", "-1") + _bump("'borrows:' || old.status", "-1"),
+    ),
+    'app_counter_borrow_au': (
+        "AFTER UPDATE OF status ON app_borrowtransaction WHEN old.status IS NOT new.status",
+        _bump("'borrows:' || old.status", "-1") + _bump("'borrows:' || new.status", "1"),
+    ),
+    'app_counter_penalty_ai': (
+        "AFTER INSERT ON app_penalty",
+        _bump("'penalties'", "1", "new.amount") + _bump("'penalties:' || new.status", "1", "new.amount"),
+    ),
+    'app_counter_penalty_ad': (
+        "AFTER DELETE ON app_penalty",
+        _bump("'penalties'", "-1", "-old.amount") + _bump("'penalties:' || old.status", "-1", "-old.amount"),
+    ),
+    'app_counter_penalty_au': (
+        "AFTER UPDATE OF status, amount ON app_penalty",
+        _bump("'penalties'", "0", "new.amount - old.amount")
+        + _bump("'penalties:' || old.status", "-1", "-old.amount")
+        + _bump("'penalties:' || new.status", "1", "new.amount"),
+    ),
+}
+
+# Page versions for conditional GETs (app/etags.py): any write to an item
+# changes the catalogue, a rename also changes every borrow list, and a
+# write to a borrow changes its borrower's list.
+VERSION_TRIGGERS = {
+    'app_version_item_ai': ("AFTER INSERT ON app_item", _touch("'items'")),
+    'app_version_item_ad': ("AFTER DELETE ON app_item", _touch("'items'")),
+    'app_version_item_au': ("AFTER UPDATE ON app_item", _touch("'items'")),
+    'app_version_item_labels_au': (
+        "AFTER UPDATE OF name, item_type, serial_number ON app_item",
+        _touch("'item-labels'"),
+    ),
+    'app_version_borrow_ai': ("AFTER INSERT ON app_borrowtransaction", _touch("'borrows:' || new.user_id")),
+    'app_version_borrow_ad': ("AFTER DELETE ON app_borrowtransaction", _touch("'borrows:' || old.user_id")),
+    'app_version_borrow_au': (
+        "AFTER UPDATE ON app_borrowtransaction",
+        _touch("'borrows:' || old.user_id") + _touch("'borrows:' || new.user_id", "new.user_id IS NOT old.user_id"),
+    ),
+}
+
+# Dashboard fragment versions (app/fragments.py): 'user:<id>' moves with
+# that user's account, profile, borrows and penalties; 'totals' with the
+# numbers on the admin dashboard.
+_PENALTY_USER = "(SELECT user_id FROM app_borrowtransaction WHERE id = {}.borrow_transaction_id)"
+FRAGMENT_TRIGGERS = {
+    'app_version_fragment_user_ai': ("AFTER INSERT ON auth_user", _touch("'totals'")),
+    'app_version_fragment_user_ad': ("AFTER DELETE ON auth_user", _touch("'totals'")),
+    'app_version_fragment_user_au': (
+        "AFTER UPDATE ON auth_user",
+        _touch("'user:' || new.id")
+        + _touch("'totals'", "old.is_staff IS NOT new.is_staff OR old.is_superuser IS NOT new.is_superuser"),
+    ),
+    'app_version_fragment_item_ai': ("AFTER INSERT ON app_item", _touch("'totals'")),
+    'app_version_fragment_item_ad': ("AFTER DELETE ON app_item", _touch("'totals'")),
+    'app_version_fragment_profile_ai': ("AFTER INSERT ON app_profile", _touch("'user:' || new.user_id")),
+    'app_version_fragment_profile_ad': ("AFTER DELETE ON app_profile", _touch("'user:' || old.user_id")),
+    'app_version_fragment_profile_au': ("AFTER UPDATE ON app_profile", _touch("'user:' || new.user_id")),
+    'app_version_fragment_borrow_ai': (
+        "AFTER INSERT ON app_borrowtransaction",
+        _touch("'user:' || new.user_id") + _touch("'totals'"),
+    ),
+    'app_version_fragment_borrow_ad': (
+        "AFTER DELETE ON app_borrowtransaction",
+        _touch("'user:' || old.user_id") + _touch("'totals'"),
+    ),
+    'app_version_fragment_borrow_au': (
+        "AFTER UPDATE ON app_borrowtransaction",
+        _touch("'user:' || new.user_id")
+        + _touch("'user:' || old.user_id", "new.user_id IS NOT old.user_id")
+        + _touch("'totals'", "old.status IS NOT new.status"),
+    ),
+    # The borrow is gone when a cascade deletes it first; skip the user then
+    'app_version_fragment_penalty_ai': (
+        "AFTER INSERT ON app_penalty",
+        _touch("'user:' || " + _PENALTY_USER.format('new'), _PENALTY_USER.format('new') + " IS NOT NULL")
+        + _touch("'totals'"),
+    ),
+    'app_version_fragment_penalty_ad': (
+        "AFTER DELETE ON app_penalty",
+        _touch("'user:' || " + _PENALTY_USER.format('old'), _PENALTY_USER.format('old') + " IS NOT NULL")
+        + _touch("'totals'"),
+    ),
+    'app_version_fragment_penalty_au': (
+        "AFTER UPDATE ON app_penalty",
+        _touch("'user:' || " + _PENALTY_USER.format('new'), _PENALTY_USER.format('new') + " IS NOT NULL")
+        + _touch("'totals'", "old.status IS NOT new.status OR old.amount IS NOT new.amount"),
+    ),
+}
+
+
+# The table each group writes to. With the app migrated back past the
+# migration creating it, that group is left out: a trigger writing to a
+# missing table would break every write to the table it watches.
+TRIGGER_GROUPS = (
+    ('app_item_fts', FTS_TRIGGERS),
+    ('app_counter', COUNTER_TRIGGERS),
+    ('app_version', VERSION_TRIGGERS),
+    ('app_version', FRAGMENT_TRIGGERS),
+)
+_WATCHED = re.compile(r'\bON (\w+)')
+
+
+def install_triggers(using='default'):
+    """Create whichever triggers are missing and can be; returns their names."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        rows = cursor.fetchall()
+        tables = {name for kind, name in rows if kind == 'table'}
+        existing = {name for kind, name in rows if kind == 'trigger'}
+        created = []
+        for target, triggers in TRIGGER_GROUPS:
+            if target not in tables:
+                continue
+            for name, (event, body) in triggers.items():
+                if name not in existing and _WATCHED.search(event).group(1) in tables:
+                    cursor.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+                    created.append(name)
+    return created
+
+
+def ensure_triggers(sender, using='default', **kwargs):
+    """post_migrate hook: restore missing triggers and resync what they maintain."""
+    from . import counters
+    from .search import rebuild_index
+
+    created = install_triggers(using)
+    if set(created) & set(FTS_TRIGGERS):
+        rebuild_index(using)
+    if set(created) & set(COUNTER_TRIGGERS):
+        counters.rebuild(using)
+    if set(created) & (set(VERSION_TRIGGERS) | set(FRAGMENT_TRIGGERS)):
+        # Writes made while they were missing went unnoticed: move every
+        # version on, so no page is served from before them
+        with connections[using].cursor() as cursor:
+            cursor.execute("UPDATE app_version SET value = value + 1")
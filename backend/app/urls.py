@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the read-heavy pages are served by their async versions
+pages = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     # Auth
@@ -11,8 +15,8 @@ urlpatterns = [
     path('about/', views.about_page, name='about'),
 
     # Dashboards
-    path('user/dashboard/', views.user_dashboard, name='user_dashboard'),
-    path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('user/dashboard/', pages.user_dashboard, name='user_dashboard'),
+    path('admin/dashboard/', pages.admin_dashboard, name='admin_dashboard'),
 
     # Admin User Management (all in one page)
     path('admin/users/', views.admin_users, name='admin_users'),
@@ -21,28 +25,36 @@ urlpatterns = [
     path('admin/items/', views.admin_items, name='admin_items'),
 
     # Borrowing System (User side under user/)
-    path('user/items/browse/', views.browse_items, name='browse_items'),
+    path('user/items/browse/', pages.browse_items, name='browse_items'),
+    path('user/items/suggest/', views.item_suggestions, name='item_suggestions'),
     path('user/items/borrow/<int:item_id>/', views.borrow_request, name='borrow_request'),
-    path('user/my-borrows/', views.my_borrows, name='my_borrows'),
+    path('user/my-borrows/', pages.my_borrows, name='my_borrows'),
 
     # Admin Borrow Management
     path('admin/borrows/', views.manage_borrows, name='manage_borrows'),
     path('admin/borrows/approve/<int:borrow_id>/', views.approve_borrow, name='approve_borrow'),
+    path('admin/borrows/approve-batch/', views.approve_borrows_batch, name='approve_borrows_batch'),
     path('admin/borrows/return/<int:borrow_id>/', views.return_item, name='return_item'),
     
     # User penalties
-    path('user/penalties/', views.user_penalties, name='user_penalties'),
+    path('user/penalties/', pages.user_penalties, name='user_penalties'),
     path("user/profile/", views.user_profile, name="user_profile"),
 
     # Admin penalties
     path('admin/penalties/', views.admin_penalties, name='admin_penalties'),
     path("admin/reports/", views.admin_reports, name="admin_reports"),  
+    path("admin/export/<str:dataset>/", views.admin_export, name="admin_export"),
+    path("admin/analytics/borrows/", views.analytics_borrows, name="analytics_borrows"),
+    path("admin/analytics/penalties/", views.analytics_penalties, name="analytics_penalties"),
     path("borrows/<int:borrow_id>/update/", views.update_borrow_status, name="update_borrow_status"),
 
     
-    path("admin/dashboard/", views.admin_dashboard, name="admin_dashboard"),
+    path("admin/dashboard/", pages.admin_dashboard, name="admin_dashboard"),
     # Admin action to cancel overdue borrow
     path('admin/borrows/cancel-overdue/<int:borrow_id>/', views.cancel_overdue, name='cancel_overdue'),
 
+    # Prometheus scrape target
+    path('metrics', views.metrics_view, name='metrics'),
+
 
 ]
@@ -1,17 +1,43 @@
+import mimetypes
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseBadRequest, Http404, FileResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
+from django.conf import settings
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db import transaction
 from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Sum, Q
-
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
+from django.db.models import Count, Sum, Q
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.static import serve
+
+from . import counters, metrics
+from .etags import versioned
+from .exports import EXPORTS, export_rows, csv_stream, ndjson_stream, gzip_stream
 from .forms import SignUpForm, BorrowForm, UserUpdateForm, ProfileUpdateForm
+from .grids import BorrowGrid, UserGrid, ItemGrid, PenaltyGrid, CatalogueGrid
+from .imports import import_items, import_users, open_csv
 from .models import Profile, Item, BorrowTransaction, Penalty
+from .pagecache import accepted_coding, public_page
+from .rollups import BUCKETS, time_series
+from .routing import read_only
+from .search import search_items, search_page
+from . import services
+from .services import (sweep_overdue, reserve_stock, return_borrow, mark_overdue, approve_pending,
+                       change_status)
+from .storage import SUFFIXES
+from .streaming import stream_table
 from django.contrib.auth.models import User
 
 # --------- Auth Views ---------
+@public_page
 def signup_view(request):
     if request.method == 'POST':
         form = SignUpForm(request.POST)
@@ -31,6 +57,7 @@ def signup_view(request):
         form = SignUpForm()
     return render(request, 'user/signup.html', {'form': form})
 
+@public_page
 def signin_view(request):
     if request.user.is_authenticated:
         return redirect('admin_dashboard' if request.user.is_staff else 'user_dashboard')
@@ -63,7 +90,19 @@ def user_dashboard(request):
 def admin_dashboard(request):
     # Admin can also check overdue borrows globally
     check_and_create_penalties()
-    return render(request, 'admin/dashboard.html')
+
+    # Read by the template only when its cached fragment is out of date
+    return render(request, 'admin/dashboard.html', {'stats': SimpleLazyObject(dashboard_stats)})
+
+def dashboard_stats():
+    # All four numbers come from the counters table in one query
+    totals = counters.read()
+    return {
+        'total_users': totals.count('accounts'),  # excluding superadmin
+        'total_items': totals.count('items'),
+        'active_borrows': totals.count('borrows:Borrowed', 'borrows:Overdue'),
+        'unpaid_penalties': totals.count('penalties:Unpaid'),
+    }
 
 
 # --------- Admin check ---------
@@ -73,8 +112,6 @@ def admin_check(user):
 # --------- Admin User Management ---------
 @user_passes_test(admin_check)
 def admin_users(request):
-    users = User.objects.filter(is_staff=False)
-
     # --- Add User ---
     if request.method == 'POST' and 'add_user' in request.POST:
         username = request.POST.get('username')
@@ -117,13 +154,21 @@ def admin_users(request):
         messages.success(request, "User deleted successfully.")
         return redirect('admin_users')
 
-    return render(request, 'admin/admin_users.html', {'users': users})
+    # --- Import Users (CSV) ---
+    import_report = None
+    if request.method == 'POST' and 'import_users' in request.POST:
+        upload = request.FILES.get('csv_file')
+        if upload is None:
+            messages.error(request, "Choose a CSV file to import.")
+            return redirect('admin_users')
+        import_report = import_users(open_csv(upload.file))
+
+    page = UserGrid(request).page()
+    return render(request, 'admin/admin_users.html', {'users': page.rows, 'page': page, 'import_report': import_report})
 
 # --------- Admin Item Management ---------
 @user_passes_test(admin_check)
 def admin_items(request):
-    items = Item.objects.all()
-
     # --- Add Item ---
     if request.method == 'POST' and 'add_item' in request.POST:
         name = request.POST.get('name')
@@ -162,14 +207,37 @@ def admin_items(request):
         messages.success(request, "Item deleted successfully.")
         return redirect('admin_items')
 
-    return render(request, 'admin/admin_items.html', {'items': items})
+    # --- Import Items (CSV) ---
+    import_report = None
+    if request.method == 'POST' and 'import_items' in request.POST:
+        upload = request.FILES.get('csv_file')
+        if upload is None:
+            messages.error(request, "Choose a CSV file to import.")
+            return redirect('admin_items')
+        import_report = import_items(open_csv(upload.file), upsert='upsert' in request.POST)
+
+    page = ItemGrid(request).page()
+    return render(request, 'admin/admin_items.html', {'items': page.rows, 'page': page, 'import_report': import_report})
 
 
 # --------- Borrowing System (User side) ---------
 @login_required
+@versioned('items')
 def browse_items(request):
-    items = Item.objects.filter(stock__gt=0)
-    return render(request, "user/browse_items.html", {"items": items})
+    query = request.GET.get("q", "").strip()
+    # Ranked full-text search when there is a query, otherwise the in-stock catalogue
+    page = search_page(request) if query else CatalogueGrid(request).page()
+    return render(request, "user/browse_items.html", {"items": page.rows, "page": page, "query": query})
+
+@login_required
+def item_suggestions(request):
+    # Type-ahead for the browse page search box
+    items = search_items(request.GET.get("q", ""), limit=8)
+    return JsonResponse({"results": [
+        {"id": item.id, "name": item.name, "item_type": item.item_type,
+         "serial_number": item.serial_number, "stock": item.stock}
+        for item in items
+    ]})
 
 @login_required
 def borrow_request(request, item_id):
@@ -194,11 +262,13 @@ def borrow_request(request, item_id):
 
 
 @login_required
+@read_only
+@versioned('borrows:{user}', 'item-labels')
 def my_borrows(request):
     # Auto-check overdue before showing list
     check_and_create_penalties(request.user)
 
-    borrows = BorrowTransaction.objects.filter(user=request.user)
+    borrows = BorrowTransaction.objects.filter(user=request.user).select_related('item')
     return render(request, "user/my_borrows.html", {"borrows": borrows})
 
 
@@ -208,41 +278,66 @@ def manage_borrows(request):
     # Auto-check overdue before showing list
     check_and_create_penalties()
 
-    borrows = BorrowTransaction.objects.all()
-    return render(request, "admin/manage_borrows.html", {"borrows": borrows})
+    if request.GET.get("all"):
+        # Every row, streamed as it is read
+        rows, page = BorrowGrid(request).everything()
+        return stream_table(request, "admin/manage_borrows.html", {"page": page},
+                            "admin/borrow_rows.html", "borrows", rows)
+
+    page = BorrowGrid(request).page()
+    return render(request, "admin/manage_borrows.html", {"borrows": page.rows, "page": page})
 
 @user_passes_test(admin_check)
 def approve_borrow(request, borrow_id):
     borrow = get_object_or_404(BorrowTransaction, id=borrow_id)
-    if borrow.item.stock >= borrow.quantity:
-        borrow.item.stock -= borrow.quantity
-        borrow.item.save()
-        borrow.status = "Borrowed"
-        borrow.borrow_date = timezone.now().date()
-        borrow.due_date = timezone.now().date() + timedelta(days=3)
-        borrow.save()
+    result = reserve_stock(borrow)
+    if result.ok:
         messages.success(request, "Borrow request approved. Due in 3 days.")
-    else:
+    elif result.reason == 'stock':
         messages.error(request, "Not enough stock.")
+    else:
+        messages.error(request, "Borrow request was already processed.")
+    return redirect("manage_borrows")
+
+@user_passes_test(admin_check)
+def approve_borrows_batch(request):
+    if request.method != "POST":
+        return redirect("manage_borrows")
+
+    borrow_ids = [int(i) for i in request.POST.getlist("borrow_ids") if i.isdigit()]
+    item_id = request.POST.get("item_id")
+    if not borrow_ids and not (item_id and item_id.isdigit()):
+        messages.error(request, "Select borrow requests or an item to approve.")
+        return redirect("manage_borrows")
+
+    batch = approve_pending(
+        borrow_ids=borrow_ids or None,
+        item_id=int(item_id) if item_id and item_id.isdigit() else None,
+    )
+    # JSON only for clients that ask for it first; browsers and */* get the page
+    wants_json = request.get_preferred_type(["text/html", "application/json"]) == "application/json"
+    if batch.conflicted:
+        if wants_json:
+            return JsonResponse({"error": "conflict"}, status=409)
+        messages.error(request, "Other approvals kept changing these requests. Please try again.")
+        return redirect("manage_borrows")
+    summary = {
+        "approved": batch.approved,
+        "skipped": len(batch.results) - batch.approved,
+        "results": {str(borrow_id): outcome for borrow_id, outcome in batch.results.items()},
+    }
+    # API callers get the per-request summary, the admin page gets a message
+    if wants_json:
+        return JsonResponse(summary)
+    messages.success(request, f"Approved {summary['approved']} request(s), skipped {summary['skipped']}.")
     return redirect("manage_borrows")
 
 @user_passes_test(admin_check)
 def return_item(request, borrow_id):
     borrow = get_object_or_404(BorrowTransaction, id=borrow_id)
 
-    if borrow.status in ['Borrowed', 'Overdue']:
-        borrow.item.stock += borrow.quantity
-        borrow.return_date = timezone.now().date()
-        borrow.status = 'Returned'
-        borrow.item.save()
-        borrow.save()
-
-        # Mark penalty as paid if exists
-        if hasattr(borrow, 'penalty'):
-            borrow.penalty.status = 'Paid'
-            borrow.penalty.paid_at = timezone.now()
-            borrow.penalty.save()
-
+    # Puts stock back and marks the penalty as paid if one exists
+    if return_borrow(borrow).ok:
         messages.success(request, "Item returned and penalty updated if any.")
     else:
         messages.error(request, "Borrow not active or already returned.")
@@ -252,13 +347,18 @@ def return_item(request, borrow_id):
 
 # --------- Penalty System ---------
 @login_required
+@read_only
 def user_penalties(request):
     # Ensure penalties are up-to-date
     check_and_create_penalties(request.user)
 
-    penalties = Penalty.objects.filter(borrow_transaction__user=request.user).order_by('-created_at')
-    paid_count = penalties.filter(status="Paid").count()
-    unpaid_count = penalties.filter(status="Unpaid").count()
+    penalties = (Penalty.objects.filter(borrow_transaction__user=request.user)
+                 .select_related('borrow_transaction__item').order_by('-created_at'))
+    # Both counts in one query
+    counts = penalties.aggregate(paid=Count('id', filter=Q(status="Paid")),
+                                 unpaid=Count('id', filter=Q(status="Unpaid")))
+    paid_count = counts['paid']
+    unpaid_count = counts['unpaid']
 
     context = {
         "penalties": penalties,
@@ -270,7 +370,6 @@ def user_penalties(request):
 
 @user_passes_test(admin_check)
 def admin_penalties(request):
-    penalties = Penalty.objects.all()
     if request.method == "POST":
         penalty_id = request.POST.get("penalty_id")
         penalty = get_object_or_404(Penalty, id=penalty_id)
@@ -279,34 +378,29 @@ def admin_penalties(request):
         penalty.save()
         messages.success(request, f"Penalty for {penalty.borrow_transaction.user.username} marked as paid.")
         return redirect("admin_penalties")
-    return render(request, "admin/penalties.html", {"penalties": penalties})
+
+    totals = counters.read()
+    stats = {
+        "total": totals.count("penalties"),
+        "unpaid": totals.count("penalties:Unpaid"),
+        "paid": totals.count("penalties:Paid"),
+    }
+    if request.GET.get("all"):
+        rows, page = PenaltyGrid(request).everything()
+        return stream_table(request, "admin/penalties.html", {"page": page, "stats": stats},
+                            "admin/penalty_rows.html", "penalties", rows)
+
+    page = PenaltyGrid(request).page()
+    return render(request, "admin/penalties.html", {"penalties": page.rows, "page": page, "stats": stats})
 
 
 # --------- Utility: Check Overdue Borrows and Create Penalties ---------
 def check_and_create_penalties(user=None):
-    borrows = BorrowTransaction.objects.filter(status__in=['Borrowed', 'Approved'])
-    if user:
-        borrows = borrows.filter(user=user)
-
-    for borrow in borrows:
-        if not borrow.due_date:
-            continue
-
-        # Mark borrow as overdue
-        if timezone.now().date() > borrow.due_date and borrow.status != 'Overdue':
-            borrow.status = 'Overdue'
-            borrow.return_date = timezone.now().date()  # <-- set date returned
-            borrow.item.stock += borrow.quantity       # optionally return stock
-            borrow.item.save()
-            borrow.save()
-
-        # Only create penalty if none exists
-        try:
-            borrow.penalty  # Access OneToOneField
-        except Penalty.DoesNotExist:
-            days_overdue = (timezone.now().date() - borrow.due_date).days
-            amount = days_overdue * 50  # 50 per day
-            Penalty.objects.create(borrow_transaction=borrow, amount=amount)
+    # In worker mode the sweep runs in `manage.py sweep_overdue` and views only read
+    if settings.PENALTY_SWEEP_MODE != 'request':
+        return None
+    # Set-based sweep: a handful of statements regardless of how many loans are active
+    return sweep_overdue(user=user)
 
 @user_passes_test(admin_check)
 def update_borrow_status(request, borrow_id):
@@ -314,121 +408,134 @@ def update_borrow_status(request, borrow_id):
 
     if request.method == "POST":
         new_status = request.POST.get("status")
-        if new_status in dict(BorrowTransaction.STATUS_CHOICES):
-
-            item = borrow.item  # convenience reference
+        # The status the admin's page showed; a transition from anything else is stale
+        seen_status = request.POST.get("seen_status", borrow.status)
+        if seen_status != borrow.status:
+            messages.error(request, "Borrow was changed by someone else. Please try again.")
+        elif new_status in dict(BorrowTransaction.STATUS_CHOICES):
 
             # --- From Pending to Borrowed ---
             if borrow.status != "Borrowed" and new_status == "Borrowed":
-                if item.stock >= borrow.quantity:
-                    item.stock -= borrow.quantity
-                    borrow.borrow_date = timezone.now().date()
-                    borrow.due_date = timezone.now().date() + timedelta(days=3)
-                    borrow.status = "Borrowed"
-
-                    # Only mark as Borrowed if stock reaches zero
-                    if item.stock == 0:
-                        item.condition = "Borrowed"
-
-                    item.save()
-                    borrow.save()
+                # Only marks the item as Borrowed if stock reaches zero
+                result = reserve_stock(borrow, mark_empty=True)
+                if result.ok:
                     messages.success(request, "Borrow status updated to Borrowed.")
-                else:
+                elif result.reason == 'stock':
                     messages.error(
                         request,
-                        f"Cannot borrow {borrow.quantity} items. Only {item.stock} available."
+                        f"Cannot borrow {borrow.quantity} items. Only {borrow.item.stock} available."
                     )
-                    return redirect("manage_borrows")
+                else:
+                    messages.error(request, "Borrow was changed by someone else. Please try again.")
 
             # --- From Borrowed/Overdue to Returned ---
             elif borrow.status in ["Borrowed", "Overdue"] and new_status == "Returned":
-                item.stock += borrow.quantity
-                borrow.return_date = timezone.now().date()
-                borrow.status = "Returned"
-
                 # If stock > 0, mark as Available
-                if item.stock > 0:
-                    item.condition = "Available"
-
-                item.save()
-                borrow.save()
-
-                penalty = getattr(borrow, 'penalty', None)
-                if penalty:
-                    penalty.status = 'Paid'
-                    penalty.paid_at = timezone.now()
-                    penalty.save()
-
-                messages.success(request, "Borrow returned and penalty updated if any.")
+                if return_borrow(borrow, mark_available=True).ok:
+                    messages.success(request, "Borrow returned and penalty updated if any.")
+                else:
+                    messages.error(request, "Borrow was changed by someone else. Please try again.")
 
             # --- Manually mark as Overdue ---
             elif new_status == "Overdue" and borrow.status != "Overdue":
-                borrow.status = "Overdue"
-                borrow.return_date = timezone.now().date()
-                item.stock += borrow.quantity
-
-                # If stock > 0, mark as Available
-                if item.stock > 0:
-                    item.condition = "Available"
-
-                item.save()
-
-                if not hasattr(borrow, 'penalty'):
-                    days_overdue = (timezone.now().date() - borrow.due_date).days
-                    amount = max(days_overdue, 1) * 50
-                    Penalty.objects.create(borrow_transaction=borrow, amount=amount)
-
-                borrow.save()
-                messages.success(request, "Borrow marked as Overdue and penalty applied.")
+                if mark_overdue(borrow).ok:
+                    messages.success(request, "Borrow marked as Overdue and penalty applied.")
+                else:
+                    messages.error(request, "Borrow was changed by someone else. Please try again.")
 
             # --- Other status changes ---
             else:
-                borrow.status = new_status
-
-                # Update condition for special statuses
-                if new_status == "Lost":
-                    item.condition = "Lost"
-                elif new_status == "Under Maintenance":
-                    item.condition = "Under Maintenance"
-                elif new_status == "Available":
-                    item.condition = "Available"
-
-                item.save()
-                borrow.save()
-                messages.success(request, f"Borrow status updated to {borrow.status}.")
+                if change_status(borrow, new_status).ok:
+                    messages.success(request, f"Borrow status updated to {new_status}.")
+                else:
+                    messages.error(request, "Borrow was changed by someone else. Please try again.")
 
     return redirect("manage_borrows")
 
 
 # --------- Reports ---------
 @user_passes_test(admin_check)
+@read_only
 def admin_reports(request):
-    total_users = User.objects.filter(is_staff=False).count()
-    total_items = Item.objects.count()
-    total_borrows = BorrowTransaction.objects.count()
-    active_borrows = BorrowTransaction.objects.filter(status__in=["Borrowed", "Overdue"]).count()
-    returned_borrows = BorrowTransaction.objects.filter(status="Returned").count()
-    pending_requests = BorrowTransaction.objects.filter(status="Pending").count()
-
-    total_penalties = Penalty.objects.count()
-    paid_penalties = Penalty.objects.filter(status="Paid").count()
-    unpaid_penalties = Penalty.objects.filter(status="Unpaid").count()
-    total_collected = Penalty.objects.filter(status="Paid").aggregate(total=Sum("amount"))["total"] or 0
-
+    totals = counters.read()
     context = {
-        "total_users": total_users,
-        "total_items": total_items,
-        "total_borrows": total_borrows,
-        "active_borrows": active_borrows,
-        "returned_borrows": returned_borrows,
-        "pending_requests": pending_requests,
-        "total_penalties": total_penalties,
-        "paid_penalties": paid_penalties,
-        "unpaid_penalties": unpaid_penalties,
-        "total_collected": total_collected,
+        "total_users": totals.count("users"),
+        "total_items": totals.count("items"),
+        "total_borrows": totals.count("borrows"),
+        "active_borrows": totals.count("borrows:Borrowed", "borrows:Overdue"),
+        "returned_borrows": totals.count("borrows:Returned"),
+        "pending_requests": totals.count("borrows:Pending"),
+        "total_penalties": totals.count("penalties"),
+        "paid_penalties": totals.count("penalties:Paid"),
+        "unpaid_penalties": totals.count("penalties:Unpaid"),
+        "total_collected": totals.amount("penalties:Paid"),
     }
     return render(request, "admin/reports.html", context)
 
+# --------- Exports ---------
+@user_passes_test(admin_check)
+@read_only
+def admin_export(request, dataset):
+    if dataset not in EXPORTS:
+        return HttpResponseBadRequest(f"dataset must be one of {', '.join(EXPORTS)}")
+
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return HttpResponseBadRequest("format must be csv or ndjson")
+
+    header, rows = export_rows(dataset, request)
+    stream = csv_stream(header, rows) if fmt == "csv" else ndjson_stream(header, rows)
+    filename = f"borrowlink-{dataset}-{timezone.now():%Y%m%d}.{fmt}"
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    if request.GET.get("gzip"):
+        stream = gzip_stream(stream)
+        filename += ".gz"
+        content_type = "application/gzip"
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# --------- Analytics (JSON time series over the daily rollups) ---------
+def _day_param(request, name):
+    # None when absent; a value that is not a real YYYY-MM-DD date raises ValueError
+    value = request.GET.get(name, "")
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+def _series_response(request, fields):
+    bucket = request.GET.get("bucket", "day")
+    if bucket not in BUCKETS:
+        return JsonResponse({"error": f"bucket must be one of {', '.join(BUCKETS)}"}, status=400)
+    try:
+        first_day, last_day = _day_param(request, "from"), _day_param(request, "to")
+    except ValueError:
+        return JsonResponse({"error": "from and to must be dates (YYYY-MM-DD)"}, status=400)
+    series = time_series(
+        fields,
+        bucket=bucket,
+        first_day=first_day,
+        last_day=last_day,
+        item_type=request.GET.get("item_type") or None,
+        by_item_type=request.GET.get("by") == "item_type",
+    )
+    return JsonResponse({"bucket": bucket, "fields": fields, "series": series})
+
+@user_passes_test(admin_check)
+@read_only
+def analytics_borrows(request):
+    return _series_response(request, ["requested", "approved", "returned", "overdue"])
+
+@user_passes_test(admin_check)
+@read_only
+def analytics_penalties(request):
+    return _series_response(request, ["overdue", "penalty_issued", "penalty_paid"])
+
 @login_required
 def user_profile(request):
     if request.method == "POST":
@@ -452,56 +559,63 @@ def user_profile(request):
         "profile_form": profile_form
     })
 
+@public_page
 def home_page(request):
     return render(request, 'user/home.html')
 
+@public_page
 def contact_page(request):
     return render(request, 'user/contact.html')
 
+@public_page
 def about_page(request):
     return render(request, 'user/about.html')
 
 
-def admin_dashboard(request):
-    # Total users excluding superadmin
-    total_users = User.objects.filter(is_superuser=False).count()
-
-    # Total items
-    total_items = Item.objects.count()
-
-    # Active borrows (Borrowed or Overdue)
-    active_borrows = BorrowTransaction.objects.filter(
-        status__in=['Borrowed', 'Overdue']
-    ).count()
-
-    # Unpaid penalties
-    unpaid_penalties = Penalty.objects.filter(status='Unpaid').count()
-
-    context = {
-        'total_users': total_users,
-        'total_items': total_items,
-        'active_borrows': active_borrows,
-        'unpaid_penalties': unpaid_penalties,
-    }
-    return render(request, 'admin/dashboard.html', context)
-
-    
 @user_passes_test(admin_check)
 def cancel_overdue(request, borrow_id):
-    borrow = get_object_or_404(BorrowTransaction, id=borrow_id)
-
-    if borrow.status == "Overdue":
-        borrow.status = "Returned"   # revert back to Returned
-        borrow.item.save()
-        borrow.save()
-
-        # Delete associated penalty if exists
-        if hasattr(borrow, 'penalty'):
-            borrow.penalty.delete()
+    borrow = get_object_or_404(BorrowTransaction.objects.select_related('item'), id=borrow_id)
 
+    if services.cancel_overdue(borrow).ok:
         messages.success(
             request,
             f"Overdue cancelled. Borrow status for {borrow.item.name} set back to Returned."
         )
-
-    return redirect("admin_penalties")
\ No newline at end of file
+    else:
+        messages.error(request, "Borrow was changed by someone else. Please try again.")
+
+    return redirect("admin_penalties")
+
+# --------- Metrics ---------
+def metrics_view(request):
+    # Prometheus scrape target; guarded by a bearer token when METRICS_TOKEN is set
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --------- Static Files ---------
+def static_asset(request, path):
+    # Mounted at STATIC_URL when SERVE_STATIC is on: fingerprinted files go
+    # out precompressed and cacheable forever, anything else revalidates
+    if not staticfiles_storage.fingerprinted(path):
+        response = serve(request, path, document_root=settings.STATIC_ROOT)
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+    try:
+        source = staticfiles_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404
+    coding = accepted_coding(request)
+    served = source + SUFFIXES[coding] if coding else source
+    if not os.path.isfile(served):
+        coding, served = None, source
+    if not os.path.isfile(served):
+        raise Http404
+    content_type = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+    response = FileResponse(open(served, 'rb'), content_type=content_type)
+    if coding:
+        response['Content-Encoding'] = coding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
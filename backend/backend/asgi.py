@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Async versions of the read-heavy views (app/async_views.py); set
+# ASYNC_VIEWS=0 to serve the sync ones in a thread per request instead
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -46,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metrics.MetricsMiddleware',
+    'app.instrumentation.RequestTimingMiddleware',
+    'app.routing.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,7 +65,7 @@ ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'app.instrumentation.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR.parent, 'frontend','templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,6 +91,45 @@ DATABASES = {
     }
 }
 
+# Optional read replica for @read_only views (reports, exports, history).
+# With SQLite it is a second file kept current by `manage.py sync_replica`.
+DATABASE_REPLICA = os.environ.get('DATABASE_REPLICA', '')
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DATABASE_REPLICA,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['app.routing.ReadReplicaRouter'] if DATABASE_REPLICA else []
+REPLICA_PIN_SECONDS = 10  # reads stay on the primary this long after a client writes
+
+# SQLite production profile (DATABASE_PROFILE=production): WAL so readers
+# never wait for the writer, pragmas applied on every new connection,
+# BEGIN IMMEDIATE so a transaction that reads before writing takes the write
+# lock up front instead of deadlocking on the upgrade, and connections kept
+# open across requests. `manage.py bench_sqlite` compares it to the default.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',        # durable at checkpoints; safe with WAL
+    'busy_timeout': 5000,           # ms a writer waits for the lock
+    'cache_size': -20000,           # KiB (negative), per connection
+    'mmap_size': 128 * 1024 * 1024,
+}
+SQLITE_PRODUCTION = {
+    'OPTIONS': {
+        'init_command': ';'.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()),
+        'transaction_mode': 'IMMEDIATE',
+    },
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+}
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'default')
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update(SQLITE_PRODUCTION)
+    if DATABASE_REPLICA:
+        # Nothing writes through the replica alias, so no IMMEDIATE there
+        DATABASES['replica'].update(SQLITE_PRODUCTION, OPTIONS={'init_command': SQLITE_PRODUCTION['OPTIONS']['init_command']})
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,8 +171,77 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic fingerprints the assets and writes .gz/.br copies beside
+# them (app/storage.py). The web server should send those with
+# Cache-Control: public, max-age=31536000, immutable (nginx: gzip_static,
+# brotli_static); without one, SERVE_STATIC=1 has Django do it.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.storage.CompressedManifestStaticFilesStorage'},
+}
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '') == '1'
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Overdue/penalty sweep
+# 'request' runs the sweep inline on the dashboard and borrow/penalty pages (legacy);
+# 'worker' leaves it to `python manage.py sweep_overdue` and keeps those views read-only.
+PENALTY_SWEEP_MODE = os.environ.get('PENALTY_SWEEP_MODE', 'request')
+PENALTY_SWEEP_INTERVAL = 60  # seconds between worker runs
+
+# Serve the read-heavy pages from app/async_views.py; asgi.py turns this on
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+
+# Rendered bodies of versioned pages (app/etags.py) are kept this long
+PAGE_CACHE_SECONDS = 300
+
+def _cache(url, name, entries):
+    # '' is per process, 'file:///dir' shared by the workers of one machine
+    # (least recently used evicted), redis:// shared between machines (set
+    # maxmemory-policy allkeys-lru on the server; needs the redis package)
+    if url.startswith(('redis://', 'rediss://')):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if url.startswith('file://'):
+        return {'BACKEND': 'app.cache.LRUFileCache', 'LOCATION': url[len('file://'):],
+                'OPTIONS': {'MAX_ENTRIES': entries}}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name,
+            'OPTIONS': {'MAX_ENTRIES': entries}}
+
+
+# Dashboard fragments (app/fragments.py), evicted least recently used once
+# FRAGMENT_CACHE_ENTRIES are stored; FRAGMENT_CACHE is a _cache() URL
+FRAGMENT_CACHE = os.environ.get('FRAGMENT_CACHE', '')
+FRAGMENT_CACHE_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_ENTRIES', 5000))
+FRAGMENT_CACHE_SECONDS = 24 * 3600  # versions do the invalidating; this only bounds garbage
+
+# Public pages as served to anonymous visitors (app/pagecache.py). For
+# `manage.py warm_page_cache` to reach the workers PUBLIC_PAGE_CACHE has
+# to be shared, e.g. 'file:///var/cache/borrowlink-pages' (its own directory)
+PUBLIC_PAGE_CACHE = os.environ.get('PUBLIC_PAGE_CACHE', '')
+PUBLIC_PAGE_SECONDS = 24 * 3600  # templates only change on deploy, which re-warms them
+PUBLIC_PAGE_MAX_AGE = 300  # how long browsers and proxies may reuse one
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'fragments': _cache(FRAGMENT_CACHE, 'fragments', FRAGMENT_CACHE_ENTRIES),
+    'pages': _cache(PUBLIC_PAGE_CACHE, 'pages', 100),
+}
+
+# Threads that write profile thumbnails after an upload
+IMAGE_WORKERS = 2
+
+# Per-request query/template timing (Server-Timing header) and slow-query log
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '') == '1'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# /metrics: per-process samples are summed across workers through this
+# directory (unset = this process only); the token, if set, is required
+# as an Authorization: Bearer header. Without METRICS_TOKEN the endpoint is
+# public, so set it (or block /metrics at the proxy) in production
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')